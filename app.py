@@ -1,24 +1,1967 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, stream_with_context
+import click
 import requests
-from bs4 import BeautifulSoup
 from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from dataclasses import dataclass, field, replace
+from typing import Optional
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict, deque
+from email.utils import format_datetime
+from urllib.parse import urlsplit
+import hashlib
+import importlib.util
+import itertools
+import base64
+import bisect
+import contextlib
+import contextvars
+import functools
+import gzip
+import json
+import logging
+import mmap
+import os
+import random
 import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
 CORS(app)
 
-BASE_URL = 'https://www.promiedos.com.ar/'
+BASE_URL = os.environ.get('BASE_URL', 'https://www.promiedos.com.ar/')
+
+# Límite de fichas descargadas en paralelo por página y tiempo máximo (segundos) para todas ellas
+FICHA_MAX_WORKERS = int(os.environ.get('FICHA_MAX_WORKERS', 8))
+FICHA_DEADLINE = float(os.environ.get('FICHA_DEADLINE', 15))
+
+# Lo mismo para las páginas de clubes de una tabla de posiciones
+CLUB_MAX_WORKERS = int(os.environ.get('CLUB_MAX_WORKERS', 8))
+CLUB_DEADLINE = float(os.environ.get('CLUB_DEADLINE', 15))
+
+# Máximo de ids o nombres distintos por petición a POST /fichas y POST /clubs
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 100))
+
+# Parser de HTML: lxml si está instalado (mucho más rápido), si no el de la librería estándar.
+# bs4 y lxml recién se importan al parsear la primera página (ver make_soup)
+DEFAULT_HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+HTML_PARSER = os.environ.get('HTML_PARSER', DEFAULT_HTML_PARSER)
+
+# fcntl permite compartir el límite de pedidos a las páginas de origen entre workers (no existe en Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# orjson serializa mucho más rápido que json; si no está se usa el de la librería estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Brotli y zstandard permiten mandar las respuestas con br y zstd; sin ellos sólo gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Partes de cada página que usan los extractores, como argumentos de SoupStrainer. Las
+# fichas y los clubes buscan textos en todo el documento, así que se parsean completos.
+PAGE_STRAINERS = {
+    'results': {'name': 'table'},
+    'standings': {'class_': 'tablesorter1'},
+}
 
-def fetch_html(url):
-    """Fetch HTML content from the given URL."""
+# Arranque en frío: archivo con los últimos resultados, tablas, clubes y fichas que se sirven
+# mientras se refrescan (ver WarmStart y "flask warm-start"), si no tiene más de WARM_START_MAX_AGE.
+# Los resultados y las fichas de partidos no finalizados cambian en minutos: se usan solo
+# mientras no tengan más de WARM_START_LIVE_MAX_AGE
+WARM_START_PATH = os.environ.get('WARM_START_PATH',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warm_start.json'))
+WARM_START_MAX_AGE = float(os.environ.get('WARM_START_MAX_AGE', 7 * 24 * 3600))
+WARM_START_LIVE_MAX_AGE = float(os.environ.get('WARM_START_LIVE_MAX_AGE', 300))
+
+# Sondeo en segundo plano de /results (RESULTS_POLLER=1). POLL_PAGES lista las páginas de
+# días a sondear además de la portada, p. ej. "ayer,manana". Sin el sondeo, /results/stream
+# solo recibe los cambios que encuentran los pedidos a /results de cualquier worker.
+RESULTS_POLLER = os.environ.get('RESULTS_POLLER', '0') == '1'
+POLL_PAGES = [''] + [page.strip() for page in os.environ.get('POLL_PAGES', '').split(',') if page.strip()]
+POLL_LIVE_INTERVAL = float(os.environ.get('POLL_LIVE_INTERVAL', 15))
+POLL_IDLE_INTERVAL = float(os.environ.get('POLL_IDLE_INTERVAL', 300))
+SNAPSHOT_MAX_AGE = float(os.environ.get('SNAPSHOT_MAX_AGE', 2 * POLL_IDLE_INTERVAL))
+
+# Eventos guardados para reanudar /results/stream, cada cuánto se manda un keep-alive por las
+# conexiones abiertas (asgi.py) y cada cuánto se reconectan los clientes bajo WSGI
+STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 2000))
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 15))
+STREAM_RETRY = float(os.environ.get('STREAM_RETRY', 5))
+
+# Compresión de las respuestas según Accept-Encoding, de la codificación preferida a la
+# última, con su nivel. Los cuerpos de menos de COMPRESS_MIN_SIZE bytes van sin comprimir.
+COMPRESS_LEVELS = {
+    'br': int(os.environ.get('COMPRESS_BR_LEVEL', 6)),
+    'zstd': int(os.environ.get('COMPRESS_ZSTD_LEVEL', 10)),
+    'gzip': int(os.environ.get('COMPRESS_GZIP_LEVEL', 9)),
+}
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 512))
+
+# Cache-Control de nuestras respuestas JSON, pensado para el edge de Vercel / CDN
+CACHE_CONTROL = {
+    'results': 'public, max-age=10, s-maxage=15, stale-while-revalidate=30',
+    'standings': 'public, max-age=300, s-maxage=900, stale-while-revalidate=600',
+    'club': 'public, max-age=86400, s-maxage=86400, stale-while-revalidate=604800',
+    'ficha': 'public, max-age=10, s-maxage=15, stale-while-revalidate=30',
+    'ficha_final': 'public, max-age=86400, s-maxage=604800, immutable',
+}
+
+# Base SQLite compartida por los workers (STORE_PATH vacío la desactiva). Los resultados
+# guardados por otro worker se sirven si no tienen más de STORE_RESULTS_MAX_AGE segundos.
+STORE_PATH = os.environ.get('STORE_PATH', os.path.join(tempfile.gettempdir(), 'promiedos.sqlite3'))
+STORE_RESULTS_MAX_AGE = float(os.environ.get('STORE_RESULTS_MAX_AGE', 15))
+ARGENTINA_TZ = timezone(timedelta(hours=-3))
+
+# Cache compartido por los workers del host (SHARED_CACHE_DIR vacío lo desactiva): cada
+# resultado se publica serializado en un archivo que los demás leen con mmap. Tiene que
+# estar en un disco local, porque flock y mmap no son confiables sobre NFS. Un worker
+# espera hasta SHARED_LOCK_TIMEOUT segundos a que otro termine de cargar la misma página.
+SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'promiedos-shared'))
+SHARED_LOCK_TIMEOUT = float(os.environ.get('SHARED_LOCK_TIMEOUT', 30))
+
+# Página de promiedos con los partidos de un día pasado, para el backfill del historial
+BACKFILL_DAY_PAGE = os.environ.get('BACKFILL_DAY_PAGE', 'fecha={date:%d-%m-%Y}')
+# Días de las páginas de resultados en vivo respecto de hoy, para guardarlas con su fecha
+DAY_PAGE_OFFSETS = {'': 0, 'ayer': -1, 'manana': 1}
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 100))
+HISTORY_MAX_PAGE_SIZE = 1000
+
+# Transporte hacia las páginas de origen
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10))
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+UPSTREAM_BACKOFF = float(os.environ.get('UPSTREAM_BACKOFF', 0.3))
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 16))
+# Cantidad de páginas cuyo ETag/Last-Modified y contenido se guardan para revalidarlas
+UPSTREAM_VALIDATORS = int(os.environ.get('UPSTREAM_VALIDATORS', 512))
+# Pedidos por segundo a cada host de origen entre todos los workers y ráfaga máxima; 0 (por
+# defecto) desactiva el límite. Al activarlo, la tasa y las esperas tienen que alcanzar para
+# las fichas y los clubes de una página dentro de FICHA_DEADLINE y CLUB_DEADLINE
+UPSTREAM_RATE = float(os.environ.get('UPSTREAM_RATE', 0))
+UPSTREAM_BURST = float(os.environ.get('UPSTREAM_BURST', 20))
+UPSTREAM_LIMIT_PATH = os.environ.get('UPSTREAM_LIMIT_PATH',
+                                     os.path.join(tempfile.gettempdir(), 'promiedos-upstream.json'))
+# Por prioridad: fracción de la ráfaga que se deja a las prioridades más altas y segundos que se
+# espera un turno antes de descartar el pedido
+UPSTREAM_PRIORITIES = {
+    'live': (0.0, float(os.environ.get('UPSTREAM_WAIT_LIVE', 10))),
+    'normal': (0.25, float(os.environ.get('UPSTREAM_WAIT_NORMAL', 5))),
+    'low': (0.5, float(os.environ.get('UPSTREAM_WAIT_LOW', 3))),
+    'backfill': (0.5, float(os.environ.get('UPSTREAM_WAIT_BACKFILL', 120))),
+}
+
+
+# Métricas de /metrics: límites (segundos) de los histogramas de tiempos y de la cantidad de
+# pedidos a las páginas de origen por petición. SERVER_TIMING=1 agrega el header Server-Timing.
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UPSTREAM_CALLS_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+
+class Metrics:
+    """Counters and histograms of this worker, rendered in the Prometheus text format.
+
+    Metrics are declared once with describe(); samples are keyed by a tuple of
+    (label, value) pairs. Recording is a dict lookup and a few additions under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._samples = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, buckets)
+        self._samples.setdefault(name, {})
+
+    def inc(self, name, labels=(), amount=1):
+        samples = self._samples[name]
+        with self._lock:
+            samples[labels] = samples.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self._meta[name][2]
+        samples = self._samples[name]
+        with self._lock:
+            counts = samples.get(labels)
+            if counts is None:
+                counts = samples[labels] = [0] * (len(buckets) + 2)
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self, extra=()):
+        """Text exposition of every metric, followed by extra (name, kind, help, {labels: value})."""
+        with self._lock:
+            snapshot = {name: {labels: list(value) if isinstance(value, list) else value
+                               for labels, value in samples.items()}
+                        for name, samples in self._samples.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in snapshot[name].items():
+                if kind != 'histogram':
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), value):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {round(value[-2], 6)}")
+                lines.append(f"{name}_count{format_labels(labels)} {value[-1]}")
+        for name, kind, help_text, samples in extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{format_labels(labels)} {value}" for labels, value in samples.items()]
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+metrics = Metrics()
+metrics.describe('promiedos_request_seconds', 'histogram', 'Time to answer each route.', METRICS_BUCKETS)
+metrics.describe('promiedos_requests_total', 'counter', 'Requests answered, by route and status.')
+metrics.describe('promiedos_stage_seconds', 'histogram', 'Time spent in each scraping stage.', METRICS_BUCKETS)
+metrics.describe('promiedos_stage_errors_total', 'counter', 'Scraping stages that raised an exception.')
+metrics.describe('promiedos_upstream_seconds', 'histogram', 'Time of each request to an upstream host.',
+                 METRICS_BUCKETS)
+metrics.describe('promiedos_upstream_requests_total', 'counter', 'Requests to upstream hosts, by result.')
+metrics.describe('promiedos_upstream_wait_seconds', 'histogram', 'Time waiting for the upstream rate limit.',
+                 METRICS_BUCKETS)
+metrics.describe('promiedos_upstream_shed_total', 'counter', 'Upstream requests dropped by the rate limit.')
+metrics.describe('promiedos_upstream_calls_per_request', 'histogram', 'Upstream requests made for each request.',
+                 UPSTREAM_CALLS_BUCKETS)
+metrics.describe('promiedos_cache_lookups_total', 'counter', 'Page cache lookups, by kind and result.')
+metrics.describe('promiedos_log_events_total', 'counter', 'Warnings and errors logged, by function.')
+
+
+class RequestTiming:
+    """Stage times and upstream requests of the request being served (see request_timing).
+
+    Stages run in parallel threads (the fichas of a page) add up, so a stage can take
+    longer than the whole request.
+    """
+
+    __slots__ = ('started', 'stages', 'upstream_calls', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def count_upstream(self):
+        with self._lock:
+            self.upstream_calls += 1
+
+    def server_timing(self, elapsed):
+        """Value of the Server-Timing header: each stage with its total time and calls."""
+        with self._lock:
+            stages = sorted(self.stages.items())
+        entries = [f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (total, count) in stages]
+        entries.append(f'upstream;desc="{self.upstream_calls} requests"')
+        entries.append(f'total;dur={elapsed * 1000:.1f}')
+        return ', '.join(entries)
+
+
+# RequestTiming de la petición en curso; iter_concurrently la pasa a sus hilos
+request_timing = contextvars.ContextVar('request_timing', default=None)
+
+
+def record_stage(stage, seconds, failed=False):
+    metrics.observe('promiedos_stage_seconds', (('stage', stage),), seconds)
+    if failed:
+        metrics.inc('promiedos_stage_errors_total', (('stage', stage),))
+    timing = request_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+def instrumented(stage):
+    """Decorator recording the duration of every call as stage (and whether it raised)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record_stage(stage, time.perf_counter() - started, failed)
+        return wrapper
+    return decorator
+
+
+class LogEventCounter(logging.Handler):
+    """Counts the warnings and errors of app.logger by level and function for /metrics."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+
+    def emit(self, record):
+        metrics.inc('promiedos_log_events_total',
+                    (('level', record.levelname.lower()), ('function', record.funcName)))
+
+
+app.logger.addHandler(LogEventCounter())
+
+
+# Prioridad de los pedidos a las páginas de origen del contexto en curso (ver upstream_priority)
+current_priority = contextvars.ContextVar('current_priority', default=None)
+PRIORITY_ORDER = {priority: order for order, priority in enumerate(UPSTREAM_PRIORITIES)}
+
+
+@contextlib.contextmanager
+def upstream_priority(priority):
+    """Give the upstream requests of the block priority, unless an outer block gave a lower one.
+
+    Priorities go from 'live' to 'normal' (the default), 'low' and 'backfill', so
+    everything a backfill fetches stays at backfill priority.
+    """
+    current = current_priority.get()
+    if current is not None and PRIORITY_ORDER[current] > PRIORITY_ORDER[priority]:
+        priority = current
+    token = current_priority.set(priority)
     try:
-        response = requests.get(url)
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class UpstreamShed(requests.RequestException):
+    """The upstream rate limit had no room for the request in time."""
+
+
+class UpstreamLimiter:
+    """Token bucket per upstream host, shared by every worker of the machine.
+
+    The buckets live in a small JSON file that is read and rewritten under an
+    exclusive flock, so all the gunicorn workers add up to rate requests per second
+    (bursts of up to burst) to each host. Each priority leaves a fraction of the
+    bucket to the higher ones and waits a bounded time for a token; a request that
+    would wait longer is shed. Without fcntl the buckets are per worker.
+    """
+
+    def __init__(self, rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, path=UPSTREAM_LIMIT_PATH,
+                 priorities=UPSTREAM_PRIORITIES):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.path = path
+        self.priorities = priorities
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._buckets = {}
+        self._counters = {'granted': {}, 'waited': {}, 'shed': {}}
+
+    def acquire(self, host, priority=None):
+        """Wait for a token of host; False if the request has to be shed."""
+        if not self.rate:
+            return True
+        priority = priority or 'normal'
+        started, waited = time.monotonic(), 0.0
+        while True:
+            delay = self.take(host, priority)
+            if not delay:
+                self.granted(priority, waited)
+                return True
+            if waited + delay > self.priorities[priority][1]:
+                self.shed(host, priority)
+                return False
+            time.sleep(delay)
+            waited = time.monotonic() - started
+
+    def take(self, host, priority):
+        """Take a token of host for priority: 0 if taken, else seconds until there may be one."""
+        reserve = self.priorities[priority][0] * self.burst
+        with self._lock:
+            fd = self._file()
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                buckets = self._read(fd)
+                now = time.time()
+                tokens, updated = buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + max(now - updated, 0) * self.rate)
+                if tokens - 1 < reserve:
+                    return (reserve + 1 - tokens) / self.rate
+                # Los hosts que ya recargaron el cubo entero no hace falta guardarlos
+                buckets = {name: bucket for name, bucket in buckets.items()
+                           if now - bucket[1] < self.burst / self.rate}
+                buckets[host] = (tokens - 1, now)
+                self._write(fd, buckets)
+                if fd is None:
+                    self._buckets = buckets
+                return 0.0
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def granted(self, priority, waited):
+        with self._lock:
+            self._counters['granted'][priority] = self._counters['granted'].get(priority, 0) + 1
+            if waited:
+                self._counters['waited'][priority] = self._counters['waited'].get(priority, 0) + 1
+        metrics.observe('promiedos_upstream_wait_seconds', (('priority', priority),), waited)
+        if waited:
+            record_stage('throttle', waited)
+
+    def shed(self, host, priority):
+        with self._lock:
+            self._counters['shed'][priority] = self._counters['shed'].get(priority, 0) + 1
+        metrics.inc('promiedos_upstream_shed_total', (('host', host), ('priority', priority)))
+
+    def _file(self):
+        # Cada proceso abre su propio descriptor: flock no excluye a quien comparte uno heredado
+        if fcntl is None or not self.path:
+            return None
+        if self._fd is None or self._pid != os.getpid():
+            try:
+                self._fd, self._pid = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), os.getpid()
+            except OSError as e:
+                app.logger.warning(f"Límite de pedidos por worker, no se pudo abrir {self.path}: {e}")
+                self.path = None
+                return None
+        return self._fd
+
+    def _read(self, fd):
+        if fd is None:
+            return self._buckets
+        try:
+            return json.loads(os.pread(fd, 65536, 0) or b'{}')
+        except ValueError:
+            return {}
+
+    def _write(self, fd, buckets):
+        if fd is None:
+            return
+        data = json.dumps(buckets).encode()
+        os.pwrite(fd, data, 0)
+        os.ftruncate(fd, len(data))
+
+    def stats(self):
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._counters.items()}
+        stats.update(rate=self.rate, burst=self.burst, shared=fcntl is not None and bool(self.path))
+        return stats
+
+
+upstream_limiter = UpstreamLimiter()
+
+
+class UpstreamClient:
+    """Keep-alive HTTP session shared by every scraper function of this worker.
+
+    The session is created lazily and again after a fork, so each gunicorn worker
+    owns its own connection pool. Requests get connect/read timeouts and are retried
+    with jittered exponential backoff on 5xx responses and connection errors. Every
+    attempt first takes a turn from limiter at the priority of the current context,
+    and raises UpstreamShed if it gets none.
+    """
+
+    def __init__(self, connect_timeout=UPSTREAM_CONNECT_TIMEOUT, read_timeout=UPSTREAM_READ_TIMEOUT,
+                 retries=UPSTREAM_RETRIES, backoff=UPSTREAM_BACKOFF, pool_size=UPSTREAM_POOL_SIZE,
+                 max_validators=UPSTREAM_VALIDATORS, limiter=upstream_limiter):
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_validators = max_validators
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._adapter = None
+        self._validators = OrderedDict()
+        self._counters = {'requests': 0, 'retries': 0, 'errors': 0, 'bytes': 0, 'not_modified': 0}
+
+    def _get_session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    # requests ya descomprime gzip/deflate, y 'br' cuando brotli está instalado
+                    session.headers['Accept-Encoding'] = requests.utils.DEFAULT_ACCEPT_ENCODING
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session, self._adapter, self._pid = session, adapter, os.getpid()
+                    self._counters = dict.fromkeys(self._counters, 0)
+        return self._session
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._counters[key] += amount
+
+    def get(self, url, **kwargs):
+        """GET url through the pooled session, retrying transient failures."""
+        session = self._get_session()
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        timing = request_timing.get()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            if not self.limiter.acquire(host, current_priority.get()):
+                raise UpstreamShed(f"Sin turno para pedir {url}")
+            self._count('requests')
+            if timing is not None:
+                timing.count_upstream()
+            started = time.perf_counter()
+            try:
+                response = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                self._count('errors')
+                self._record(host, started, 'error')
+                if attempt == self.retries:
+                    raise
+                app.logger.warning(f"Reintentando {url}: {e}")
+                continue
+            self._record(host, started, str(response.status_code))
+            self._count('bytes', len(response.content))
+            if response.status_code < 500 or attempt == self.retries:
+                return response
+            self._count('errors')
+            app.logger.warning(f"Reintentando {url}: HTTP {response.status_code}")
+
+    def _record(self, host, started, outcome):
+        metrics.observe('promiedos_upstream_seconds', (('host', host),), time.perf_counter() - started)
+        metrics.inc('promiedos_upstream_requests_total', (('host', host), ('outcome', outcome)))
+
+    def get_text(self, url):
+        """Body of url as text, revalidating the copy seen before with If-None-Match/If-Modified-Since.
+
+        Validators are only sent for URLs whose previous response carried an ETag or a
+        Last-Modified header; on 304 the stored body is returned.
+        """
+        known, headers = self._conditional_headers(url)
+        response = self.get(url, headers=headers)
+        if response.status_code == 304 and known:
+            self._count('not_modified')
+            return known[2]
         response.raise_for_status()
-        return response.text
+
+        text = response.text
+        self._remember_validators(url, response.headers, text)
+        return text
+
+    def _conditional_headers(self, url):
+        """(validators known for url or None, headers that revalidate them)."""
+        with self._lock:
+            known = self._validators.get(url)
+        headers = {}
+        if known:
+            etag, last_modified, _ = known
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return known, headers
+
+    def _remember_validators(self, url, response_headers, text):
+        etag, last_modified = response_headers.get('ETag'), response_headers.get('Last-Modified')
+        with self._lock:
+            self._validators.pop(url, None)
+            if etag or last_modified:
+                self._validators[url] = (etag, last_modified, text)
+                while len(self._validators) > self.max_validators:
+                    self._validators.popitem(last=False)
+
+    def stats(self):
+        """Counters of this worker; 'reuses' are requests served on an already open connection."""
+        with self._lock:
+            stats = dict(self._counters)
+        connections = 0
+        if self._adapter is not None:
+            pools = self._adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                connections += pool.num_connections if pool else 0
+        stats['connections'] = connections
+        stats['reuses'] = max(stats['requests'] - connections, 0)
+        return stats
+
+
+upstream = UpstreamClient()
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into a single execution.
+
+    The first caller runs fn(); callers arriving while it is still running wait for
+    it and get the same result (or exception). Keys are tuples whose first item names
+    the kind of work, which is what the collapsed counters are grouped by.
+    """
+
+    class _Call:
+        __slots__ = ('event', 'result', 'error')
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executions = {}
+        self._collapsed = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self._collapsed[key[0]] = self._collapsed.get(key[0], 0) + 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._executions[key[0]] = self._executions.get(key[0], 0) + 1
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': dict(self._executions),
+                'collapsed': dict(self._collapsed),
+                'collapsed_total': sum(self._collapsed.values()),
+            }
+
+
+inflight = SingleFlight()
+
+@instrumented('fetch')
+def fetch_html(url):
+    """Fetch HTML content from the given URL.
+
+    Concurrent calls for the same URL share one download.
+    """
+    return inflight.do(('html', url), lambda: _fetch_html(url))
+
+
+def _fetch_html(url):
+    try:
+        return upstream.get_text(url)
+    except UpstreamShed as e:
+        app.logger.warning(str(e))
+        return None
     except requests.RequestException as e:
         app.logger.error(f"Request error: {e}")
         return None
 
+
+class ParseMemo:
+    """Skip parsing pages whose HTML did not change since they were last parsed.
+
+    Keeps, per (route, url), a hash of the last HTML parsed and what was extracted
+    from it; parse() returns that result again while the hash matches. Results are
+    shared, so callers must not modify them. The CPU time spent parsing is added up
+    per route.
+    """
+
+    def __init__(self, maxlen=2048):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._parses = {}
+        self._avoided = {}
+        self._cpu = {}
+
+    def parse(self, route, url, html_content, parser):
+        digest = hashlib.blake2b(html_content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        key = (route, url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == digest:
+                self._entries.move_to_end(key)
+                self._avoided[route] = self._avoided.get(route, 0) + 1
+                return entry[1]
+
+        started = time.thread_time()
+        result = parser(html_content)
+        cpu = time.thread_time() - started
+        with self._lock:
+            self._entries[key] = (digest, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxlen:
+                self._entries.popitem(last=False)
+            self._parses[route] = self._parses.get(route, 0) + 1
+            self._cpu[route] = self._cpu.get(route, 0.0) + cpu
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'parses': dict(self._parses), 'avoided': dict(self._avoided),
+                    'cpu_seconds': {route: round(cpu, 4) for route, cpu in self._cpu.items()}}
+
+
+parse_memo = ParseMemo()
+
+
+# Frescura (segundos) de cada tipo de página y cuánto más se puede servir vencida mientras se refresca
+CACHE_TTLS = {
+    'club': float(os.environ.get('CACHE_TTL_CLUB', 24 * 3600)),
+    'standings': float(os.environ.get('CACHE_TTL_STANDINGS', 15 * 60)),
+    'ficha': float(os.environ.get('CACHE_TTL_FICHA', 20)),
+}
+CACHE_STALE = {
+    'club': float(os.environ.get('CACHE_STALE_CLUB', 7 * 24 * 3600)),
+    'standings': float(os.environ.get('CACHE_STALE_STANDINGS', 3600)),
+    'ficha': float(os.environ.get('CACHE_STALE_FICHA', 60)),
+}
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Las claves del cache compartido que nadie publicó en SHARED_CACHE_MAX_AGE segundos (por defecto,
+# la frescura más la ventana vencida más largas) se borran del disco cada SHARED_CACHE_SWEEP_INTERVAL
+SHARED_CACHE_MAX_AGE = float(os.environ.get('SHARED_CACHE_MAX_AGE',
+                                            max(CACHE_TTLS[kind] + CACHE_STALE[kind] for kind in CACHE_TTLS)))
+SHARED_CACHE_SWEEP_INTERVAL = float(os.environ.get('SHARED_CACHE_SWEEP_INTERVAL', 3600))
+
+
+class PageCache:
+    """In-process LRU cache of scraped results with per-kind TTL and stale-while-revalidate.
+
+    Entries are keyed by (kind, key). A fresh entry is returned as is; an expired one
+    still inside its stale window is returned immediately while a background thread
+    reloads it; anything older is loaded in the calling thread. The total size of the
+    entries (measured as their JSON length) is kept under max_bytes evicting the least
+    recently used ones.
+    """
+
+    def __init__(self, ttls=CACHE_TTLS, stale=CACHE_STALE, max_bytes=CACHE_MAX_BYTES):
+        self.ttls = ttls
+        self.stale = stale
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._bytes = 0
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'shared_hits': 0, 'store_hits': 0, 'evictions': 0,
+                          'refresh_errors': 0}
+
+    def ttl_for(self, kind, value):
+        """Seconds value stays fresh; None keeps it forever and 0 means do not cache."""
+        if not value:
+            return 0
+        if kind == 'ficha':
+            data, status = value
+            if status != 200 or data.error is not None:
+                return 0
+            # Un partido finalizado ya no cambia
+            if data.estado == 'Finalizado':
+                return None
+        return self.ttls[kind]
+
+    def get_or_load(self, kind, key, loader):
+        """Return the cached value for (kind, key), calling loader() when needed."""
+        value, state = self.lookup(kind, key)
+        if state == 'refresh':
+            threading.Thread(target=self._refresh, args=(kind, key, loader), daemon=True).start()
+        if state != 'miss':
+            return value
+
+        return inflight.do((kind, key), lambda: self._load(kind, key, loader))
+
+    def lookup(self, kind, key):
+        """Return (value, state) for (kind, key) without loading anything.
+
+        state is 'fresh', 'stale', 'refresh' (stale, and the caller has to refresh it and
+        then call refresh_done) or 'miss' (value is None).
+        """
+        cache_key = (kind, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                value, fresh_until, stale_until, _ = entry
+                if fresh_until is None or now < fresh_until:
+                    self._entries.move_to_end(cache_key)
+                    self._counters['hits'] += 1
+                    metrics.inc('promiedos_cache_lookups_total', (('kind', kind), ('result', 'hit')))
+                    return value, 'fresh'
+                if now < stale_until:
+                    self._entries.move_to_end(cache_key)
+                    self._counters['stale_hits'] += 1
+                    metrics.inc('promiedos_cache_lookups_total', (('kind', kind), ('result', 'stale')))
+                    if cache_key in self._refreshing:
+                        return value, 'stale'
+                    self._refreshing.add(cache_key)
+                    return value, 'refresh'
+            self._counters['misses'] += 1
+        metrics.inc('promiedos_cache_lookups_total', (('kind', kind), ('result', 'miss')))
+        return None, 'miss'
+
+    def refresh_done(self, kind, key, error=None):
+        """End the refresh handed out by lookup(), successful unless error is given."""
+        with self._lock:
+            self._refreshing.discard((kind, key))
+            if error is not None:
+                self._counters['refresh_errors'] += 1
+        if error is not None:
+            app.logger.error(f"Error refrescando {kind} {key}: {error}")
+
+    def reload(self, kind, key, loader):
+        """Load (kind, key) again ignoring any cached or stored value, and cache the result."""
+        with self._lock:
+            self._counters['misses'] += 1
+        return inflight.do((kind, key), lambda: self._load(kind, key, loader, use_store=False))
+
+    def peek(self, kind, key):
+        """Return the cached value for (kind, key), even if stale, without loading it."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            return entry[0] if entry is not None else None
+
+    def items(self, kind):
+        """(key, value) of every cached entry of kind, even if stale."""
+        with self._lock:
+            return [(key, entry[0]) for (entry_kind, key), entry in self._entries.items() if entry_kind == kind]
+
+    def _load(self, kind, key, loader, use_store=True):
+        # Con el lock del host un solo worker va a la página de origen: los demás esperan y
+        # toman lo que publicó, o lo que dejó en la base compartida
+        with shared_cache.lock(kind, key):
+            value = self.from_host(kind, key) if use_store else None
+            if value is None:
+                value = loader()
+                self.remember(kind, key, value)
+        return value
+
+    def from_host(self, kind, key):
+        """Cache and return the fresh value of (kind, key) left by any worker: the shared cache, else the store."""
+        value = self._from_loaded(kind, key, shared_cache.load(kind, key), 'shared')
+        if value is None:
+            value = self.from_store(kind, key)
+        return value
+
+    def from_store(self, kind, key):
+        """Cache and return the value of (kind, key) saved in the store if still fresh, else None."""
+        return self._from_loaded(kind, key, match_store.load(kind, key), 'store')
+
+    def _from_loaded(self, kind, key, loaded, source):
+        if loaded is None:
+            return None
+        value, age = loaded
+        ttl = self.ttl_for(kind, value)
+        if ttl is None or (ttl and age < ttl):
+            with self._lock:
+                self._counters[f'{source}_hits'] += 1
+            metrics.inc('promiedos_cache_lookups_total', (('kind', kind), ('result', source)))
+            self.store(kind, key, value, age)
+            return value
+        return None
+
+    def remember(self, kind, key, value):
+        """Cache a freshly loaded value and, if it may be cached, save it in the store and publish it."""
+        if self.store(kind, key, value):
+            match_store.save(kind, key, value)
+            shared_cache.publish(kind, key, value)
+
+    def _refresh(self, kind, key, loader):
+        try:
+            inflight.do((kind, key), lambda: self._load(kind, key, loader))
+        except Exception as e:
+            self.refresh_done(kind, key, e)
+        else:
+            self.refresh_done(kind, key)
+
+    def store(self, kind, key, value, age=0):
+        """Save value, loaded age seconds ago, under (kind, key); False if its TTL forbids caching it."""
+        ttl = self.ttl_for(kind, value)
+        if ttl == 0:
+            return False
+        size = len(dumps_json(value))
+        if size > self.max_bytes:
+            return True
+        now = time.monotonic() - age
+        fresh_until = None if ttl is None else now + ttl
+        stale_until = None if ttl is None else fresh_until + self.stale.get(kind, 0)
+        cache_key = (kind, key)
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self._bytes -= old[3]
+            self._entries[cache_key] = (value, fresh_until, stale_until, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+                self._counters['evictions'] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+page_cache = PageCache()
+
+
+def page_name(url):
+    """Name of a promiedos page from its URL ('' for the home page)."""
+    return url[len(BASE_URL):] if url.startswith(BASE_URL) else url
+
+
+def results_page_date(url):
+    """Date (ISO) of the matches of a results page: DAY_PAGE_OFFSETS or BACKFILL_DAY_PAGE; None if unknown."""
+    page = page_name(url)
+    if page in DAY_PAGE_OFFSETS:
+        return (datetime.now(ARGENTINA_TZ).date() + timedelta(days=DAY_PAGE_OFFSETS[page])).isoformat()
+    prefix, _, rest = BACKFILL_DAY_PAGE.partition('{date:')
+    date_format, _, suffix = rest.partition('}')
+    if page.startswith(prefix) and page.endswith(suffix):
+        try:
+            return datetime.strptime(page[len(prefix):len(page) - len(suffix)], date_format).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+class MatchStore:
+    """SQLite database (WAL mode) with the records produced by the scrapers.
+
+    Holds the match rows of each results page per day, the fichas, the standings rows
+    of each league and the clubs, so they survive restarts and every worker of the
+    host reads the same copy. Each thread of each process opens its own connection.
+    With path=None every method is a no-op.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS matches (
+            page TEXT NOT NULL,
+            date TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            match_id TEXT NOT NULL,
+            league TEXT,
+            home_team TEXT,
+            away_team TEXT,
+            game_state TEXT,
+            data TEXT NOT NULL,
+            scraped_at REAL NOT NULL,
+            home_score TEXT,
+            away_score TEXT,
+            PRIMARY KEY (page, date, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_matches_match_id ON matches (match_id);
+        CREATE INDEX IF NOT EXISTS idx_matches_league_date ON matches (league, date);
+        CREATE INDEX IF NOT EXISTS idx_matches_date ON matches (date);
+        CREATE INDEX IF NOT EXISTS idx_matches_home_team ON matches (home_team, date);
+        CREATE INDEX IF NOT EXISTS idx_matches_away_team ON matches (away_team, date);
+        CREATE TABLE IF NOT EXISTS fichas (
+            match_id TEXT PRIMARY KEY,
+            estado TEXT,
+            data TEXT NOT NULL,
+            scraped_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS standings (
+            league TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            team TEXT,
+            name TEXT,
+            data TEXT NOT NULL,
+            scraped_at REAL NOT NULL,
+            PRIMARY KEY (league, position)
+        );
+        CREATE TABLE IF NOT EXISTS clubs (
+            name TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            scraped_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path or None
+        self._local = threading.local()
+        self._counters = {'reads': 0, 'writes': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        # Partidos ya decodificados de cada página: (date, scraped_at, matches)
+        self._decoded = {}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # Bases creadas antes de que matches tuviera las columnas de los goles
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(matches)')}
+        if columns and 'home_score' not in columns:
+            conn.execute('ALTER TABLE matches ADD COLUMN home_score TEXT')
+            conn.execute('ALTER TABLE matches ADD COLUMN away_score TEXT')
+        conn.executescript(self.SCHEMA)
+        self._reserialize_matches(conn)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _reserialize_matches(conn):
+        """Rewrite the data of matches saved with json.dumps (user_version 0) as dumps_json writes it."""
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= 1:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Otro proceso pudo haberlas reescrito mientras esperábamos el lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                conn.executemany('UPDATE matches SET data = ? WHERE rowid = ?', [
+                    (dumps_json(json.loads(data), newline=False).decode(), rowid)
+                    for rowid, data in conn.execute('SELECT rowid, data FROM matches').fetchall()
+                ])
+                conn.execute('PRAGMA user_version = 1')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _run(self, counter, fn):
+        if not self.path:
+            return None
+        try:
+            result = fn(self._connection())
+            with self._lock:
+                self._counters[counter] += 1
+            return result
+        except sqlite3.Error as e:
+            app.logger.error(f"Error en la base {self.path}: {e}")
+            with self._lock:
+                self._counters['errors'] += 1
+            return None
+
+    @staticmethod
+    def _relative(url):
+        return page_name(url)
+
+    def load(self, kind, key):
+        """Return (value, age_in_seconds) stored for a page cache entry, or None."""
+        def query(conn):
+            if kind == 'ficha':
+                row = conn.execute('SELECT data, scraped_at FROM fichas WHERE match_id = ?', (key,)).fetchone()
+                return (FichaDetails.from_json(json.loads(row[0])), 200, row[1]) if row else None
+            if kind == 'club':
+                row = conn.execute('SELECT data, scraped_at FROM clubs WHERE name = ?',
+                                   (self._relative(key),)).fetchone()
+                return (Club.from_json(json.loads(row[0])), row[1]) if row else None
+            if kind == 'standings':
+                rows = conn.execute('SELECT data, scraped_at FROM standings WHERE league = ? ORDER BY position',
+                                    (self._relative(key),)).fetchall()
+                return ([StandingRow.from_json(json.loads(row[0])) for row in rows],
+                        min(row[1] for row in rows)) if rows else None
+            return None
+
+        row = self._run('reads', query)
+        if row is None:
+            return None
+        value, scraped_at = (row[:2], row[2]) if kind == 'ficha' else row
+        return value, max(time.time() - scraped_at, 0)
+
+    def save(self, kind, key, value):
+        """Store a page cache entry."""
+        now = time.time()
+
+        def write(conn):
+            with conn:
+                if kind == 'ficha':
+                    data, _ = value
+                    conn.execute('INSERT OR REPLACE INTO fichas VALUES (?, ?, ?, ?)',
+                                 (key, data.estado, json.dumps(data.to_json(), ensure_ascii=False), now))
+                elif kind == 'club':
+                    conn.execute('INSERT OR REPLACE INTO clubs VALUES (?, ?, ?)',
+                                 (self._relative(key), json.dumps(value.to_json(), ensure_ascii=False), now))
+                elif kind == 'standings':
+                    league = self._relative(key)
+                    conn.execute('DELETE FROM standings WHERE league = ?', (league,))
+                    conn.executemany('INSERT INTO standings VALUES (?, ?, ?, ?, ?, ?)', [
+                        (league, i, row.team, row.name, json.dumps(row.to_json(), ensure_ascii=False), now)
+                        for i, row in enumerate(value)
+                    ])
+
+        self._run('writes', write)
+
+    def save_matches(self, url, matches, date=None):
+        """Replace the matches stored for the results page url on date (see results_page_date by default).
+
+        Pages whose date is not known are not stored.
+        """
+        page = self._relative(url)
+        date = date or results_page_date(url)
+        if date is None:
+            return
+        now = time.time()
+
+        def write(conn):
+            with conn:
+                conn.execute('DELETE FROM matches WHERE page = ? AND date = ?', (page, date))
+                conn.executemany(
+                    'INSERT INTO matches (page, date, position, match_id, league, home_team, away_team, game_state,'
+                    ' data, scraped_at, home_score, away_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+                        (page, date, i, match.match_id, match.league_title, match.home_team, match.away_team,
+                         match.game_state, dumps_json(match, newline=False).decode(), now, match.home_score,
+                         match.away_score)
+                        for i, match in enumerate(matches)
+                    ])
+
+        self._run('writes', write)
+
+    def load_matches(self, url, max_age, date=None):
+        """Return (matches, age) of the latest save of url on date if it is newer than max_age.
+
+        Until the page is saved again the same list is returned, so its serialized body
+        is reused (see SerializedPayloads).
+        """
+        page = self._relative(url)
+        date = date or results_page_date(url)
+        if date is None:
+            return None
+        with self._lock:
+            known = self._decoded.get(page)
+
+        def query(conn):
+            scraped_at = conn.execute('SELECT MAX(scraped_at) FROM matches WHERE page = ? AND date = ?',
+                                      (page, date)).fetchone()[0]
+            if scraped_at is None or (known and known[:2] == (date, scraped_at)):
+                return scraped_at, None
+            return scraped_at, conn.execute('SELECT data FROM matches WHERE page = ? AND date = ? ORDER BY position',
+                                            (page, date)).fetchall()
+
+        scraped_at, rows = self._run('reads', query) or (None, None)
+        if scraped_at is None:
+            return None
+        age = max(time.time() - scraped_at, 0)
+        if age > max_age:
+            return None
+        if rows is None:
+            return known[2], age
+        matches = [Match.from_json(json.loads(row[0])) for row in rows]
+        with self._lock:
+            self._decoded[page] = (date, scraped_at, matches)
+        return matches, age
+
+    def has_page(self, url, date):
+        """True if the results page url was stored for date."""
+        row = self._run('reads', lambda conn: conn.execute(
+            'SELECT 1 FROM matches WHERE page = ? AND date = ? LIMIT 1', (self._relative(url), date)).fetchone())
+        return row is not None
+
+    def iter_matches(self, league=None, team=None, date_from=None, date_to=None, state=None, after=None, limit=100):
+        """Yield ((date, page, position), match_json) of the stored matches that pass the filters.
+
+        Matches come ordered by date, page and position; after is the key of the last
+        match of the previous page of results. A match stored by several pages for the
+        same date (the live page and the backfill of that day) comes once, as it was
+        last scraped. The JSON is yielded as stored, without decoding it.
+        """
+        if not self.path:
+            return
+        where, params = [], []
+        if league:
+            where.append('league = ?')
+            params.append(league)
+        if team:
+            where.append('(home_team = ? OR away_team = ?)')
+            params += [team, team]
+        if date_from:
+            where.append('date >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('date <= ?')
+            params.append(date_to)
+        # El estado y el cursor se aplican a la última copia de cada partido
+        sql = ('SELECT date, page, position, data FROM (SELECT date, page, position, data, game_state, '
+               'ROW_NUMBER() OVER (PARTITION BY match_id, date ORDER BY scraped_at DESC, page) AS copy FROM matches')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ')'
+        where = ['copy = 1']
+        if state == 'finished':
+            where.append("game_state = 'Finalizado'")
+        elif state == 'scheduled':
+            where.append("game_state LIKE 'Inicio:%'")
+        elif state == 'live':
+            where.append("game_state != 'Finalizado' AND game_state NOT LIKE 'Inicio:%'")
+        if after:
+            where.append('(date, page, position) > (?, ?, ?)')
+            params += list(after)
+
+        sql += ' WHERE ' + ' AND '.join(where) + ' ORDER BY date, page, position LIMIT ?'
+        params.append(limit)
+
+        try:
+            cursor = self._connection().execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(100)
+                if not rows:
+                    break
+                for date, page, position, data in rows:
+                    yield (date, page, position), data
+        except sqlite3.Error as e:
+            app.logger.error(f"Error consultando el historial: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['path'] = self.path
+        return stats
+
+
+match_store = MatchStore()
+
+
+class SharedCache:
+    """Values published by the workers of the host, as files that every worker maps with mmap.
+
+    Each (kind, key) gets a directory under path with one immutable file per version,
+    named after the ETag of its body (the JSON of the value, as /results, /club and
+    /ficha serve it), and a "current" symlink to the latest one. publish() writes the
+    version to a temporary file and renames it into place, then swaps the symlink the
+    same way, so a reader only ever sees complete versions. load() maps the current
+    version and decodes it straight from the mapping, which then serves as the body of
+    the value (see SerializedPayloads.adopt): every worker answers from the same pages
+    of memory. lock() is a flock on the key, taken by whoever loads it so the other
+    workers wait and use the copy it publishes. Every sweep_interval, publish() also
+    starts a sweep() that removes the directories of keys not published for max_age.
+    With path=None every method is a no-op.
+    """
+
+    DECODERS = {
+        'results': lambda data: [Match.from_json(item) for item in data],
+        'standings': lambda data: [StandingRow.from_json(item) for item in data],
+        'club': lambda data: Club.from_json(data),
+        'ficha': lambda data: (FichaDetails.from_json(data), 200),
+    }
+    # Las versiones reemplazadas se borran pasado este tiempo, por si alguien acaba de leer el symlink
+    OLD_VERSION_GRACE = 60
+
+    def __init__(self, path=SHARED_CACHE_DIR, lock_timeout=SHARED_LOCK_TIMEOUT, maxlen=1024,
+                 max_age=SHARED_CACHE_MAX_AGE, sweep_interval=SHARED_CACHE_SWEEP_INTERVAL):
+        self.path = path or None
+        self.lock_timeout = lock_timeout
+        self.maxlen = maxlen
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic()
+        # Última versión decodificada de cada clave: (etag, value)
+        self._loaded = OrderedDict()
+        self._counters = {'published': 0, 'hits': 0, 'misses': 0, 'decoded': 0, 'lock_waits': 0,
+                          'lock_timeouts': 0, 'errors': 0, 'evicted': 0}
+
+    def _dir(self, kind, key):
+        return os.path.join(self.path, kind, hashlib.blake2b(key.encode(), digest_size=16).hexdigest())
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def publish(self, kind, key, value):
+        """Make value the current version of (kind, key) for every worker."""
+        if not self.path:
+            return
+        # La misma entrada con la que se responde el valor, así se serializa una sola vez
+        entry = serialized_payloads.get(value[0] if kind == 'ficha' else value)
+        body, etag = entry['body'], entry['etag']
+        directory = self._dir(kind, key)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            version = os.path.join(directory, f'{etag}.json')
+            if not os.path.exists(version):
+                fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+                os.fchmod(fd, 0o644)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp, version)
+            link = os.path.join(directory, f'.current-{os.getpid()}-{threading.get_ident()}')
+            os.symlink(f'{etag}.json', link)
+            os.replace(link, os.path.join(directory, 'current'))
+            self._prune(directory, f'{etag}.json')
+        except OSError as e:
+            app.logger.error(f"Error publicando {kind} {key} en {self.path}: {e}")
+            self._count('errors')
+            return
+        with self._lock:
+            self._counters['published'] += 1
+            sweep = time.monotonic() >= self._next_sweep
+            if sweep:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+        if sweep:
+            threading.Thread(target=self.sweep, daemon=True).start()
+
+    def _prune(self, directory, current):
+        limit = time.time() - self.OLD_VERSION_GRACE
+        for entry in os.scandir(directory):
+            if entry.name in (current, 'current', 'lock'):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime < limit:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """Remove the directories of the keys nobody published for max_age seconds; returns how many."""
+        if not self.path:
+            return 0
+        limit = time.time() - self.max_age
+        removed = 0
+        for kind in self.DECODERS:
+            try:
+                directories = [entry.path for entry in os.scandir(os.path.join(self.path, kind)) if entry.is_dir()]
+            except OSError:
+                continue
+            for directory in directories:
+                if self._expired(directory, limit) and self._evict(directory, limit):
+                    removed += 1
+        with self._lock:
+            self._counters['evicted'] += removed
+        return removed
+
+    @staticmethod
+    def _expired(directory, limit):
+        # Sin "current" (una carga que falló) cuenta desde que se creó el directorio
+        for path in (os.path.join(directory, 'current'), directory):
+            try:
+                return os.lstat(path).st_mtime < limit
+            except FileNotFoundError:
+                continue
+        return False
+
+    def _evict(self, directory, limit):
+        fd = None
+        try:
+            if fcntl is not None:
+                fd = os.open(os.path.join(directory, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+                # Si alguien la está cargando no está abandonada; se verá en el próximo barrido
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if not self._expired(directory, limit):
+                return False
+            # Quien ya tenía abierto el lock viejo puede cargarla de nuevo: a lo sumo se scrapea dos veces
+            shutil.rmtree(directory)
+            return True
+        except BlockingIOError:
+            return False
+        except OSError as e:
+            app.logger.error(f"Error borrando {directory}: {e}")
+            self._count('errors')
+            return False
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def load(self, kind, key, max_age=None):
+        """Return (value, age) of the current version of (kind, key), or None if there is none as recent."""
+        if not self.path:
+            return None
+        directory = self._dir(kind, key)
+        current = os.path.join(directory, 'current')
+        try:
+            target = os.readlink(current)
+            age = max(time.time() - os.lstat(current).st_mtime, 0)
+        except OSError:
+            self._count('misses')
+            return None
+        if max_age is not None and age > max_age:
+            self._count('misses')
+            return None
+
+        etag = target[:-len('.json')]
+        with self._lock:
+            loaded = self._loaded.get((kind, key))
+            if loaded is not None and loaded[0] == etag:
+                self._loaded.move_to_end((kind, key))
+                self._counters['hits'] += 1
+                return loaded[1], age
+
+        path = os.path.join(directory, target)
+        try:
+            with open(path, 'rb') as f:
+                body = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                modified = os.fstat(f.fileno()).st_mtime
+            value = self.DECODERS[kind](loads_json(body))
+        except (OSError, ValueError) as e:
+            app.logger.error(f"Error leyendo {kind} {key} de {self.path}: {e}")
+            self._count('errors')
+            return None
+        last_modified = datetime.fromtimestamp(modified, timezone.utc).replace(microsecond=0)
+        serialized_payloads.adopt(value[0] if kind == 'ficha' else value, body, etag, last_modified, path)
+        with self._lock:
+            self._loaded[(kind, key)] = (etag, value)
+            self._loaded.move_to_end((kind, key))
+            while len(self._loaded) > self.maxlen:
+                self._loaded.popitem(last=False)
+            self._counters['hits'] += 1
+            self._counters['decoded'] += 1
+        return value, age
+
+    def acquire(self, kind, key):
+        """Take the host-wide lock of (kind, key), waiting up to lock_timeout; returns what release() takes."""
+        if not self.path or fcntl is None:
+            return None
+        try:
+            directory = self._dir(kind, key)
+            os.makedirs(directory, exist_ok=True)
+            fd = os.open(os.path.join(directory, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            app.logger.error(f"Error abriendo el lock de {kind} {key} en {self.path}: {e}")
+            self._count('errors')
+            return None
+        deadline = time.monotonic() + self.lock_timeout
+        waited = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waited:
+                    waited = True
+                    self._count('lock_waits')
+                if time.monotonic() >= deadline:
+                    # El que lo tiene se colgó: mejor cargarla de nuevo que seguir esperando
+                    app.logger.warning(f"Sin el lock de {kind} {key} tras {self.lock_timeout:.0f}s")
+                    self._count('lock_timeouts')
+                    os.close(fd)
+                    return None
+                time.sleep(0.05)
+        return fd
+
+    @staticmethod
+    def release(fd):
+        if fd is not None:
+            # Cerrar el descriptor suelta el flock
+            os.close(fd)
+
+    @contextlib.contextmanager
+    def lock(self, kind, key):
+        """Hold the host-wide lock of (kind, key) for the block."""
+        fd = self.acquire(kind, key)
+        try:
+            yield
+        finally:
+            self.release(fd)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['decoded_entries'] = len(self._loaded)
+        stats['path'] = self.path
+        return stats
+
+
+shared_cache = SharedCache()
+
+
+class SerializedPayloads:
+    """Serialized JSON bodies of recently served payload objects.
+
+    Payloads that come out of a cache or a snapshot are the same object on every
+    request, so their body, ETag and Last-Modified are computed once and reused, once
+    per projection (see project), and so is the body compressed with each encoding
+    (see encoded). Entries hold a reference to the payload, which keeps its id() from
+    being reused.
+    """
+
+    def __init__(self, maxlen=256):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._first_seen = OrderedDict()
+
+    def get(self, payload, projection=None):
+        """Return the entry of payload: a dict with 'body', 'etag' and 'last_modified'."""
+        key = (id(payload), projection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['payload'] is payload:
+                self._entries.move_to_end(key)
+                return entry
+
+        started = time.perf_counter()
+        body = dumps_json(payload if projection is None else [project(item, projection) for item in payload])
+        record_stage('serialize', time.perf_counter() - started)
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        with self._lock:
+            # El mismo contenido reconstruido conserva su Last-Modified
+            last_modified = self._first_seen.pop(etag, None) or datetime.now(timezone.utc).replace(microsecond=0)
+            self._first_seen[etag] = last_modified
+            entry = {'payload': payload, 'body': body, 'etag': etag, 'last_modified': last_modified, 'encoded': {},
+                     'path': None}
+            self._add(key, entry)
+        return entry
+
+    def adopt(self, payload, body, etag, last_modified, path):
+        """Take body, published at path by some worker (see SharedCache), as the serialized payload."""
+        with self._lock:
+            self._first_seen.setdefault(etag, last_modified)
+            self._add((id(payload), None), {'payload': payload, 'body': body, 'etag': etag,
+                                            'last_modified': last_modified, 'encoded': {}, 'path': path})
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxlen:
+            self._entries.popitem(last=False)
+        while len(self._first_seen) > self.maxlen * 4:
+            self._first_seen.popitem(last=False)
+
+    @staticmethod
+    def encoded(entry, encoding):
+        """The body of entry compressed with encoding, computed by the first request that asks for it."""
+        body = entry['encoded'].get(encoding)
+        if body is None:
+            body = entry['encoded'][encoding] = compress_body(entry['body'], encoding)
+        return body
+
+
+serialized_payloads = SerializedPayloads()
+
+
+# Codificaciones disponibles, en el orden de COMPRESS_LEVELS
+CONTENT_ENCODINGS = [encoding for encoding in COMPRESS_LEVELS
+                     if {'br': brotli, 'zstd': zstandard}.get(encoding, gzip) is not None]
+
+
+def negotiate_encoding(accept_encodings, size):
+    """Encoding of CONTENT_ENCODINGS to send a body of size bytes with, or None to send it as is."""
+    if size < COMPRESS_MIN_SIZE:
+        return None
+    return accept_encodings.best_match(CONTENT_ENCODINGS)
+
+
+def compress_body(body, encoding):
+    """body compressed with encoding ('br', 'zstd' or 'gzip') at its level in COMPRESS_LEVELS."""
+    started = time.perf_counter()
+    level = COMPRESS_LEVELS[encoding]
+    if encoding == 'br':
+        data = brotli.compress(body, quality=level)
+    elif encoding == 'zstd':
+        data = zstandard.ZstdCompressor(level=level).compress(body)
+    else:
+        # mtime=0: el mismo cuerpo da siempre los mismos bytes
+        data = gzip.compress(body, level, mtime=0)
+    record_stage('compress', time.perf_counter() - started)
+    return data
+
+
+def cached_json_response(payload, cache_control, projection=None):
+    """JSON response with ETag, Last-Modified and Cache-Control; 304 if the client is up to date.
+
+    The body goes compressed if the client accepts it, with the bytes kept in the entry of
+    serialized_payloads for the next requests.
+    """
+    entry = serialized_payloads.get(payload, projection)
+    encoding = negotiate_encoding(request.accept_encodings, len(entry['body']))
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(entry['etag'])
+    else:
+        not_modified = bool(request.if_modified_since) and entry['last_modified'] <= request.if_modified_since
+
+    if not_modified:
+        response = app.response_class(status=304)
+    elif encoding is None:
+        response = (published_file_response(entry)
+                    or app.response_class(bytes(entry['body']), mimetype=app.config['JSONIFY_MIMETYPE']))
+    else:
+        response = app.response_class(serialized_payloads.encoded(entry, encoding),
+                                      mimetype=app.config['JSONIFY_MIMETYPE'])
+        response.headers['Content-Encoding'] = encoding
+    # Como nginx: la versión comprimida lleva el mismo ETag, débil, así un 304 vale para cualquiera
+    response.set_etag(entry['etag'], weak=encoding is not None)
+    response.headers['Last-Modified'] = format_datetime(entry['last_modified'], usegmt=True)
+    response.headers['Cache-Control'] = cache_control
+    if len(entry['body']) >= COMPRESS_MIN_SIZE:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def published_file_response(entry):
+    """Response sending the file SharedCache published for entry through wsgi.file_wrapper, or None.
+
+    gunicorn sends such a response with sendfile, straight from the page cache of the
+    host to the socket.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if entry['path'] is None or file_wrapper is None:
+        return None
+    try:
+        f = open(entry['path'], 'rb')
+    except OSError:
+        # Una versión vieja ya borrada: se manda la copia mapeada
+        return None
+    response = app.response_class(file_wrapper(f), mimetype=app.config['JSONIFY_MIMETYPE'], direct_passthrough=True)
+    response.content_length = len(entry['body'])
+    return response
+
+
+# Claves que se pueden pedir con ?fields= en /results y /standings, y las que van siempre
+# porque enlazan con la ficha (/ficha=<match_id>) o el club (/club=<name>)
+RESULT_FIELDS = frozenset(('id', 'leagueTitle', 'leagueLogo', 'gameState', 'homeTeam', 'homeLogo', 'awayTeam',
+                           'awayLogo', 'homeScore', 'awayScore', 'homeScorers', 'awayScorers', 'time', 'image',
+                           'game_info_href'))
+STANDING_FIELDS = frozenset(('team', 'played', 'won', 'drawn', 'lost', 'gf', 'ga', 'gd', 'points', 'name',
+                             'team_details'))
+RESULT_LINK_FIELDS = frozenset(('id',))
+STANDING_LINK_FIELDS = frozenset(('name',))
+
+
+def requested_fields(args, allowed, always):
+    """Keys asked for with ?fields=a,b (plus always), or None for all of them; ValueError if one is unknown."""
+    value = args.get('fields')
+    if not value:
+        return None
+    fields = frozenset(name.strip() for name in value.split(',') if name.strip())
+    unknown = fields - allowed
+    if unknown:
+        raise ValueError(f"Campos desconocidos en 'fields': {', '.join(sorted(unknown))}")
+    return fields | always
+
+
+def requested_expand(args, fields):
+    """True if the nested details (fichas, clubs) are wanted.
+
+    ?expand=details or ?expand=none decide; without it they come unless ?fields= was given.
+    """
+    expand = args.get('expand')
+    if expand is None:
+        return fields is None
+    if expand not in ('details', 'none'):
+        raise ValueError("El parámetro 'expand' debe ser details o none")
+    return expand == 'details'
+
+
+def project(item, projection):
+    """JSON of item for a (fields, details) projection: only those keys, and without the ficha unless details."""
+    fields, details = projection
+    data = item.to_json() if details else item.to_json(details=False)
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def requested_stream_format():
+    """'ndjson' (Accept: application/x-ndjson), 'array' (?stream=1) or None for a normal response."""
+    if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+        return 'ndjson'
+    if request.args.get('stream') in ('1', 'true'):
+        return 'array'
+    return None
+
+
+def streamed_json_response(items, stream_format, projection=None):
+    """Send items one by one, as NDJSON lines or as the same JSON array jsonify would build."""
+    def generate():
+        first = True
+        for item in items:
+            body = dumps_json(item if projection is None else project(item, projection), newline=False)
+            if stream_format == 'ndjson':
+                yield body + b'\n'
+            else:
+                yield (b'[' if first else b',') + body
+            first = False
+        if stream_format == 'array':
+            yield b'[]\n' if first else b']\n'
+
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else app.config['JSONIFY_MIMETYPE']
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def streamed_json_object(pairs, stream_format):
+    """Send (key, value) pairs one by one, as NDJSON {key: value} lines or as a single JSON object."""
+    def generate():
+        first = True
+        for key, value in pairs:
+            body = dumps_json({key: to_json(value)}, newline=False)
+            if stream_format == 'ndjson':
+                yield body + b'\n'
+            else:
+                # Cada línea es {"clave":valor}: sin las llaves queda la entrada del objeto
+                yield (b'{' if first else b',') + body[1:-1]
+            first = False
+        if stream_format == 'array':
+            yield b'{}\n' if first else b'}\n'
+
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else app.config['JSONIFY_MIMETYPE']
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@instrumented('soup')
+def make_soup(html_content, page=None, parser=None):
+    """Parse html_content with the configured backend, keeping only what page needs."""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html_content, parser or HTML_PARSER, parse_only=page_strainer(page))
+
+
+@functools.lru_cache(maxsize=None)
+def page_strainer(page):
+    """SoupStrainer of PAGE_STRAINERS for page, or None to parse the whole page."""
+    from bs4 import SoupStrainer
+    return SoupStrainer(**PAGE_STRAINERS[page]) if page in PAGE_STRAINERS else None
+
+
+def intern_text(value):
+    """sys.intern for the strings repeated on many rows (leagues, teams, logos, states)."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# Valor de los campos opcionales que no aparecen en el JSON (distinto de null)
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        # Al deserializar (p. ej. desde otro proceso) sigue siendo el mismo MISSING
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+@dataclass(slots=True, frozen=True)
+class Scorer:
+    minute: str
+    scorer_name: str
+
+    def to_json(self):
+        return {'minute': self.minute, 'scorerName': self.scorer_name}
+
+
+@dataclass(slots=True)
+class FichaDetails:
+    """What /ficha serves for a match; only error is set when it could not be extracted."""
+    estado: Optional[str] = None
+    cambios_local: Optional[str] = None
+    cambios_visitante: Optional[str] = None
+    goles: tuple = ()
+    amarillas: tuple = ()
+    rojas: tuple = ()
+    error: Optional[str] = None
+
+    def to_json(self):
+        if self.error is not None:
+            return {'error': self.error}
+        return {
+            'estado': self.estado,
+            'cambios_local': self.cambios_local,
+            'cambios_visitante': self.cambios_visitante,
+            'goles': list(self.goles),
+            'amarillas': list(self.amarillas),
+            'rojas': list(self.rojas),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if 'error' in data:
+            return cls(error=data['error'])
+        return cls(data.get('estado'), data.get('cambios_local'), data.get('cambios_visitante'),
+                   tuple(data.get('goles', ())), tuple(data.get('amarillas', ())), tuple(data.get('rojas', ())))
+
+
+@dataclass(slots=True)
+class Match:
+    """A row of a results page. time/image and game_info_href stay None when the row has none."""
+    match_id: str
+    league_title: Optional[str]
+    league_logo: Optional[str]
+    game_state: str
+    home_team: str
+    home_logo: Optional[str]
+    away_team: str
+    away_logo: Optional[str]
+    home_score: str
+    away_score: str
+    home_scorers: tuple = ()
+    away_scorers: tuple = ()
+    additional_data: Optional[FichaDetails] = None
+    time: Optional[str] = None
+    image: Optional[str] = None
+    game_info_href: Optional[str] = None
+
+    def to_json(self, details=True):
+        """Shape served by /results; details=False leaves additional_data out of id."""
+        match_id = {'match_id': self.match_id}
+        if details:
+            match_id['additional_data'] = self.additional_data.to_json() if self.additional_data is not None else None
+        data = {
+            'id': match_id,
+            'leagueTitle': self.league_title,
+            'leagueLogo': self.league_logo,
+            'gameState': self.game_state,
+            'homeTeam': self.home_team,
+            'homeLogo': self.home_logo,
+            'awayTeam': self.away_team,
+            'awayLogo': self.away_logo,
+            'homeScore': self.home_score,
+            'awayScore': self.away_score,
+            'homeScorers': [scorer.to_json() for scorer in self.home_scorers],
+            'awayScorers': [scorer.to_json() for scorer in self.away_scorers],
+        }
+        if self.time is not None:
+            data['time'] = self.time
+            data['image'] = self.image
+        if self.game_info_href is not None:
+            data['game_info_href'] = self.game_info_href
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        additional_data = data['id'].get('additional_data')
+        return cls(
+            data['id']['match_id'], data['leagueTitle'], data['leagueLogo'], data['gameState'],
+            data['homeTeam'], data['homeLogo'], data['awayTeam'], data['awayLogo'],
+            data['homeScore'], data['awayScore'],
+            tuple(Scorer(scorer['minute'], scorer['scorerName']) for scorer in data['homeScorers']),
+            tuple(Scorer(scorer['minute'], scorer['scorerName']) for scorer in data['awayScorers']),
+            FichaDetails.from_json(additional_data) if additional_data is not None else None,
+            data.get('time'), data.get('image'), data.get('game_info_href'),
+        )
+
+
+@dataclass(slots=True)
+class Club:
+    nombre: str
+    nombre_completo: str
+    fundado: str
+    apodo: str
+    estadio: Optional[str]
+    imagen: str
+
+    def to_json(self):
+        return {
+            'nombre': self.nombre,
+            'nombreCompleto': self.nombre_completo,
+            'fundado': self.fundado,
+            'apodo': self.apodo,
+            'estadio': self.estadio,
+            'imagen': self.imagen,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['nombre'], data['nombreCompleto'], data['fundado'], data['apodo'], data['estadio'],
+                   data['imagen'])
+
+
+@dataclass(slots=True)
+class StandingRow:
+    """A row of a standings table; team_details is MISSING until club details are attached."""
+    team: str
+    played: str
+    won: str
+    drawn: str
+    lost: str
+    gf: str
+    ga: str
+    gd: str
+    points: str
+    name: Optional[str]
+    team_details: object = field(default=MISSING)
+
+    def to_json(self):
+        data = {
+            'team': self.team,
+            'played': self.played,
+            'won': self.won,
+            'drawn': self.drawn,
+            'lost': self.lost,
+            'gf': self.gf,
+            'ga': self.ga,
+            'gd': self.gd,
+            'points': self.points,
+            'name': self.name,
+        }
+        if self.team_details is not MISSING:
+            data['team_details'] = self.team_details.to_json() if self.team_details is not None else None
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        row = cls(data['team'], data['played'], data['won'], data['drawn'], data['lost'], data['gf'], data['ga'],
+                  data['gd'], data['points'], data['name'])
+        if 'team_details' in data:
+            row.team_details = Club.from_json(data['team_details']) if data['team_details'] else None
+        return row
+
+
+def to_json(value):
+    """Convert the internal models (or lists/tuples of them) to the JSON shape served by the API."""
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if hasattr(value, 'to_json'):
+        return value.to_json()
+    return value
+
+
+def dumps_json(value, newline=True):
+    """Serialize value like jsonify does (sorted keys, compact) as bytes, with orjson if installed.
+
+    orjson writes non-ASCII characters as UTF-8 instead of \\u escapes; the decoded
+    JSON is the same.
+    """
+    data = to_json(value)
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | (orjson.OPT_APPEND_NEWLINE if newline else 0))
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return (body + '\n' if newline else body).encode()
+
+
+def loads_json(data):
+    """Parse JSON out of bytes or a buffer such as an mmap (without copying it if orjson is installed)."""
+    if orjson is not None:
+        with memoryview(data) as view:
+            return orjson.loads(view)
+    return json.loads(bytes(data))
+
+
 def get_scorers_list(scorers_text):
     """Process the scorers text into a list of scorers."""
     if not scorers_text:
@@ -29,7 +1972,7 @@ def get_scorers_list(scorers_text):
     for scorer in scorers_list:
         parts = scorer.split("'")
         if len(parts) == 2:
-            result.append({'minute': parts[0].strip(), 'scorerName': parts[1].strip()})
+            result.append(Scorer(parts[0].strip(), parts[1].strip()))
         else:
             app.logger.warning(f"Unexpected scorer format: {scorer}")
     return result
@@ -42,8 +1985,12 @@ def safe_get_attr(element, attr, default=None):
     """Safely get an attribute from a BeautifulSoup element."""
     return element[attr].strip() if element and element.has_attr(attr) else default
 
-def process_match_row(row, league_title, league_logo):
-    """Process a row of match data."""
+def process_match_row(row, league_title, league_logo, fetch_details=True):
+    """Process a row of match data.
+
+    With fetch_details=False the ficha is not requested and additional_data is left
+    as None so the caller can fill it (see fetch_match_details_concurrently).
+    """
     try:
         columns = row.find_all('td')
         if len(columns) < 2:
@@ -91,27 +2038,22 @@ def process_match_row(row, league_title, league_logo):
         away_score = safe_get_text(row.find(class_='game-r2').find('span'), '0')
 
         # Obtener datos adicionales desde el endpoint de la ficha
-        additional_data = fetch_match_details(match_id)
-
-        match = {
-            'id': {
-                'match_id': match_id,
-                'additional_data': additional_data  # Datos adicionales desde la ficha
-            },
-            'leagueTitle': league_title,
-            'leagueLogo': league_logo,
-            'gameState': game_state_display,
-            'homeTeam': home_team,
-            'homeLogo': home_logo,
-            'awayTeam': away_team,
-            'awayLogo': away_logo,
-            'homeScore': home_score,
-            'awayScore': away_score,
-            'homeScorers': [],
-            'awayScorers': []
-        }
-
-        return match
+        additional_data = fetch_match_details(match_id) if fetch_details else None
+
+        # Ligas, equipos y logos se repiten en cada fila y en cada scrape: se internan
+        return Match(
+            match_id=match_id,
+            league_title=intern_text(league_title),
+            league_logo=intern_text(league_logo),
+            game_state=intern_text(game_state_display),
+            home_team=intern_text(home_team),
+            home_logo=intern_text(home_logo),
+            away_team=intern_text(away_team),
+            away_logo=intern_text(away_logo),
+            home_score=home_score,
+            away_score=away_score,
+            additional_data=additional_data,  # Datos adicionales desde la ficha
+        )
 
     except Exception as e:
         app.logger.error(f"Error processing match row: {e}")
@@ -120,38 +2062,415 @@ def process_match_row(row, league_title, league_logo):
 
 
 
-def fetch_match_details(match_id):
+def load_ficha(match_id):
+    """Download and parse a ficha; returns (data, status_code) as served by /ficha."""
+    match_url = f"{BASE_URL}ficha={match_id}"
+    html_content = fetch_html(match_url)
+    if not html_content:
+        return FichaDetails(error="No se pudo acceder a la página del partido"), 500
+    return ficha_result(parse_memo.parse('ficha', match_url, html_content, parse_ficha_page))
+
+
+def parse_ficha_page(html_content):
+    """Extract the ficha data out of the HTML of a ficha page."""
+    return extract_ficha(make_soup(html_content, 'ficha'))
+
+
+def ficha_result(match_data):
+    """(data, status_code) served by /ficha for what parse_ficha_page extracted."""
+    if match_data:
+        return match_data, 200
+    return FichaDetails(error="No se encontró el contenido entre 'usoficha' y 'ficha-estadisticas'"), 404
+
+
+def get_ficha_cached(match_id, refresh=False):
+    """Return load_ficha(match_id) through the page cache; refresh skips the cached copy."""
+    if refresh:
+        return page_cache.reload('ficha', match_id, lambda: load_ficha(match_id))
+    return page_cache.get_or_load('ficha', match_id, lambda: load_ficha(match_id))
+
+
+@instrumented('ficha')
+def fetch_match_details(match_id, refresh=False):
     """Fetch match details from the ficha endpoint."""
     try:
-        match_url = f"{BASE_URL}ficha={match_id}"
-        response = requests.get(match_url)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            content = extract_usoficha_to_estadisticas(soup)
-            if content:
-                match_data = parse_match_content(content, soup)
-
-                # Verificación para evitar mostrar partidos con información desconocida
-                return match_data
-        return {"error": "No se pudieron obtener detalles del partido"}
+        match_data, status = get_ficha_cached(match_id, refresh)
+        if status == 200:
+            return match_data
+        return FichaDetails(error="No se pudieron obtener detalles del partido")
     except Exception as e:
         app.logger.error(f"Error fetching match details: {e}")
-        return {"error": "Error al acceder al endpoint de ficha"}
+        return FichaDetails(error="Error al acceder al endpoint de ficha")
+
+
+def fetch_concurrently(fn, keys, max_workers, deadline, default=None):
+    """Call fn(key) for every distinct key in parallel and return {key: result}.
+
+    At most max_workers calls run at the same time and all of them must finish within
+    deadline seconds; a call that fails or arrives late maps to default.
+    """
+    return dict(iter_concurrently(fn, keys, max_workers, deadline, default))
+
+
+def iter_concurrently(fn, keys, max_workers, deadline, default=None, ordered=True):
+    """Like fetch_concurrently, but yield (key, result) as each one is ready.
+
+    Results come in key order, or in the order they finish if ordered is false.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    end = time.monotonic() + deadline
+    try:
+        # Cada tarea corre en una copia del contexto para que sus tiempos cuenten en la petición
+        futures = {key: executor.submit(contextvars.copy_context().run, fn, key) for key in keys}
+        if ordered:
+            done = futures.items()
+        else:
+            done = ((key, future) for key, future in _as_completed(futures, end))
+        for key, future in done:
+            try:
+                result = future.result(timeout=max(end - time.monotonic(), 0))
+            except Exception:
+                app.logger.warning(f"{getattr(fn, '__name__', fn)}({key}) sin respuesta a tiempo")
+                result = default
+            yield key, result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _as_completed(futures, end):
+    """(key, future) of {key: future} as they finish; the ones still running at end come last."""
+    keys = {future: key for key, future in futures.items()}
+    try:
+        for future in as_completed(keys, timeout=max(end - time.monotonic(), 0)):
+            yield keys.pop(future), future
+    except FuturesTimeout:
+        pass
+    # Los que no terminaron a tiempo: future.result falla enseguida y dan el valor por defecto
+    for future, key in keys.items():
+        yield key, future
+
+
+def iter_with_results(items, key_of, results):
+    """Yield (item, result of its key) in item order, consuming an iter_concurrently generator."""
+    found = {}
+    try:
+        for item in items:
+            key = key_of(item)
+            if key is not None and key not in found:
+                for done_key, result in results:
+                    found[done_key] = result
+                    if done_key == key:
+                        break
+            yield item, found.get(key)
+    finally:
+        results.close()
+
+
+def iter_match_details(matches, max_workers=None, deadline=None, refresh=()):
+    """Yield the matches in order, each one as soon as its ficha is in additional_data.
+
+    A ficha that fails or arrives after the deadline gets the error placeholder
+    instead. Match ids in refresh skip the ficha cache. Fichas of live matches are
+    fetched with priority over the rest.
+    """
+    live = {match.match_id for match in matches if is_live_match(match)}
+
+    def fetch_ficha(match_id):
+        with upstream_priority('live' if match_id in live else 'normal'):
+            return fetch_match_details(match_id, match_id in refresh)
+
+    details = iter_concurrently(
+        fetch_ficha,
+        [match.match_id for match in matches],
+        max_workers or FICHA_MAX_WORKERS,
+        FICHA_DEADLINE if deadline is None else deadline,
+        default=FichaDetails(error="No se pudieron obtener detalles del partido"),
+    )
+    for match, additional_data in iter_with_results(matches, lambda match: match.match_id, details):
+        match.additional_data = additional_data
+        yield match
+
+
+def fetch_match_details_concurrently(matches, max_workers=None, deadline=None, refresh=()):
+    """Fill additional_data of every match fetching the fichas in parallel (see iter_match_details)."""
+    for _ in iter_match_details(matches, max_workers, deadline, refresh):
+        pass
+    return matches
+
+
+def match_fingerprint(match):
+    """What identifies the state of a match row: when it changes, its ficha may have too."""
+    return (
+        match.match_id,
+        match.game_state,
+        match.home_score,
+        match.away_score,
+        match.home_scorers,
+        match.away_scorers,
+    )
+
+
+class MatchTracker:
+    """Remembers the last scrape of each results page to only re-fetch changed fichas.
+
+    Rows whose fingerprint is the same as in the previous scrape of the page reuse its
+    additional_data; the rest get their ficha fetched again (skipping the ficha cache
+    when the row was already known). The ids fetched on the last scrape of each page
+    are kept as its list of changed matches, and every scrape is published to the
+    EventBroker of the page with its differences from the previous one (see
+    match_deltas). A scrape made by another worker is taken as the last one with
+    follow().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._changed = {}
+        self._counters = {'reused': 0, 'fetched': 0, 'followed': 0}
+
+    def fill_details(self, url, matches):
+        for _ in self.iter_details(url, matches):
+            pass
+        return matches
+
+    def iter_details(self, url, matches):
+        """Yield the matches of url in order as their additional_data is filled."""
+        changed, refresh, previous = self.reuse_known(url, matches)
+        fetched = iter_match_details(changed, refresh=refresh)
+        changed_ids = {id(match) for match in changed}
+        for match in matches:
+            if id(match) in changed_ids:
+                next(fetched)  # Devuelve este mismo partido, ya con su ficha
+            yield match
+        self.remember(url, matches, changed, previous)
+
+    def reuse_known(self, url, matches):
+        """Give unchanged matches the ficha of the previous scrape of url.
+
+        Returns (changed, refresh, previous): the matches whose ficha must be fetched,
+        the ids among them that must skip the ficha cache, and the previous scrape
+        (None on the first one) to pass on to remember().
+        """
+        with self._lock:
+            previous = self._pages.get(url)
+
+        changed = []
+        refresh = set()
+        for match in matches:
+            match_id = match.match_id
+            known = previous.get(match_id) if previous else None
+            if known and known[0] == match_fingerprint(match) and known[1].additional_data.error is None:
+                match.additional_data = known[1].additional_data
+            else:
+                changed.append(match)
+                if known:
+                    refresh.add(match_id)
+        return changed, refresh, previous
+
+    def follow(self, url, matches):
+        """Take matches of url, scraped by another worker, as the last scrape and publish what changed."""
+        if result_events(url).version == serialized_payloads.get(matches)['etag']:
+            return
+        with self._lock:
+            previous = self._pages.get(url)
+        known = previous or {}
+        changed = [match for match in matches if match.match_id not in known or known[match.match_id][1] != match]
+        self.remember(url, matches, changed, previous, fetched=False)
+
+    def remember(self, url, matches, changed, previous, fetched=True):
+        """Keep this scrape of url (fichas filled) and publish it with what changed since previous."""
+        deltas = []
+        if previous is not None:
+            for match in changed:
+                known = previous.get(match.match_id)
+                deltas.extend(match_deltas(known[1] if known else None, match))
+
+        with self._lock:
+            self._pages[url] = {match.match_id: (match_fingerprint(match), match) for match in matches}
+            self._changed[url] = [match.match_id for match in changed]
+            if fetched:
+                self._counters['reused'] += len(matches) - len(changed)
+                self._counters['fetched'] += len(changed)
+            else:
+                self._counters['followed'] += 1
+
+        result_events(url).publish(deltas, serialized_payloads.get(matches)['etag'], matches)
+
+    def changed(self, url):
+        """Ids of the matches whose ficha was fetched on the last scrape of url."""
+        with self._lock:
+            return list(self._changed.get(url, ()))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['changed'] = {url: len(ids) for url, ids in self._changed.items()}
+        return stats
+
+
+match_tracker = MatchTracker()
+
+
+def match_deltas(old, new):
+    """Events describing what changed in a match between two scrapes of its page."""
+    match_id = new.match_id
+    if old is None:
+        return [{'type': 'match', 'match_id': match_id, 'match': new.to_json()}]
+
+    deltas = []
+    if (old.home_score, old.away_score) != (new.home_score, new.away_score):
+        deltas.append({'type': 'score', 'match_id': match_id,
+                       'homeScore': new.home_score, 'awayScore': new.away_score})
+    for side, old_scorers, new_scorers in (('home', old.home_scorers, new.home_scorers),
+                                           ('away', old.away_scorers, new.away_scorers)):
+        for scorer in new_scorers:
+            if scorer not in old_scorers:
+                deltas.append({'type': 'scorer', 'match_id': match_id, 'side': side, 'scorer': scorer.to_json()})
+    if old.game_state != new.game_state:
+        deltas.append({'type': 'state', 'match_id': match_id, 'gameState': new.game_state})
+
+    old_data, new_data = old.additional_data or FichaDetails(), new.additional_data or FichaDetails()
+    if new_data.error is None:
+        if old_data.estado != new_data.estado:
+            deltas.append({'type': 'estado', 'match_id': match_id, 'estado': new_data.estado})
+        if (old_data.cambios_local, old_data.cambios_visitante) != (new_data.cambios_local, new_data.cambios_visitante):
+            deltas.append({'type': 'substitutions', 'match_id': match_id,
+                           'cambios_local': new_data.cambios_local, 'cambios_visitante': new_data.cambios_visitante})
+    return deltas
+
+
+class EventBroker:
+    """Bounded log of the match deltas of a results page, that any number of readers follow by cursor.
+
+    Every publish() takes the page to a new version, the ETag of its matches as /results
+    serves them, and keeps those matches as the snapshot new readers start from. Events
+    are numbered in order and a reader's cursor is the number of the last one it got.
+    The id clients see is the version for the last event of a publish, so it means the
+    same state of the page on every worker that reached it, and "<token>.<number>" for
+    the others, which only this process can resume from (see cursor_for). Readers keep
+    no queue of their own, so an idle subscriber only costs its position in the log;
+    listeners are called after every publish with events (see asgi.py).
+    """
+
+    def __init__(self, maxlen=STREAM_BUFFER_SIZE):
+        self.token = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=maxlen)
+        self._last = 0
+        # Cursor en el que quedó cada versión, mientras sus eventos siguientes estén en el log
+        self._versions = OrderedDict()
+        self._snapshot = (None, None, 0)
+        self._listeners = []
+
+    @property
+    def last(self):
+        return self._last
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def publish(self, events, version, matches):
+        """Append the events that took the page to version, whose matches are matches."""
+        with self._lock:
+            for n, event in enumerate(events, 1):
+                self._last += 1
+                self._events.append((self._last, version if n == len(events) else f'{self.token}.{self._last}', event))
+            self._snapshot = (version, matches, self._last)
+            self._versions[version] = self._last
+            self._versions.move_to_end(version)
+            oldest = self._events[0][0] - 1 if self._events else self._last
+            while len(self._versions) > 1 and (next(iter(self._versions.values())) < oldest
+                                              or len(self._versions) > self._events.maxlen):
+                self._versions.popitem(last=False)
+            listeners = list(self._listeners) if events else ()
+        for listener in listeners:
+            listener()
+
+    def snapshot(self):
+        """(id, matches, cursor) of the current version; matches is None before the first publish."""
+        with self._lock:
+            version, matches, cursor = self._snapshot
+            return version or f'{self.token}.{cursor}', matches, cursor
+
+    def cursor_for(self, event_id):
+        """Cursor of a client whose last event was event_id, or None if it has to start from a snapshot."""
+        if not event_id:
+            return None
+        token, _, number = event_id.partition('.')
+        with self._lock:
+            cursor = int(number) if token == self.token and number.isdigit() else self._versions.get(event_id)
+            if cursor is None or not self._has_since(cursor):
+                return None
+            return cursor
+
+    def since(self, cursor):
+        """(cursor, id, event) of the events after cursor, or None if some of them were already dropped."""
+        with self._lock:
+            if not self._has_since(cursor):
+                return None
+            start = cursor + 1 - self._events[0][0] if self._events else 0
+            return [self._events[i] for i in range(max(start, 0), len(self._events))]
+
+    def _has_since(self, cursor):
+        return cursor <= self._last and not (self._events and self._events[0][0] > cursor + 1)
+
+
+_result_events = {}
+_result_events_lock = threading.Lock()
 
 
+def result_events(url):
+    """EventBroker with the match deltas of a results page."""
+    with _result_events_lock:
+        if url not in _result_events:
+            _result_events[url] = EventBroker()
+        return _result_events[url]
+
 
 def validate_match_data(match_data):
     """Validate if the extracted match data is complete."""
+    match_data = to_json(match_data)
     required_fields = ['homeTeam', 'awayTeam', 'homeScore', 'awayScore', 'leagueTitle']
-    for field in required_fields:
-        if not match_data.get(field):
+    for name in required_fields:
+        if not match_data.get(name):
             return False
     return True
 
 
 
-def extract_matches(soup):
-    """Extract match data from the parsed HTML, including scorers, game time images, and href from game-info."""
+def extract_matches(soup, url=None):
+    """Extract match data from the parsed HTML, including scorers, game time images, and href from game-info.
+
+    When url is given only the fichas of the rows that changed since the previous
+    scrape of that page are fetched again (see MatchTracker).
+    """
+    return fill_match_details(extract_match_rows(soup), url)
+
+
+def fill_match_details(matches, url=None):
+    """Fetch the fichas of the matches, all together and in parallel."""
+    if url is not None:
+        return match_tracker.fill_details(url, matches)
+    return fetch_match_details_concurrently(matches)
+
+
+@instrumented('extract_matches')
+def extract_match_rows(soup):
+    """Extract the matches of the parsed HTML without their fichas (additional_data is None)."""
     matches = []
     rows = soup.find_all('tr', attrs={'name': ['nvp', 'vp']})
 
@@ -172,7 +2491,7 @@ def extract_matches(soup):
                 league_logo = f"{BASE_URL}{league_logo}" if league_logo else None
 
             # Procesar la fila del partido
-            match = process_match_row(row, league_title, league_logo)
+            match = process_match_row(row, league_title, league_logo, fetch_details=False)
             
             # Verificar si hay información de la hora del juego y alguna imagen dentro de 'game-time'
             game_time = row.find(class_='game-time')
@@ -185,16 +2504,16 @@ def extract_matches(soup):
                     img_url = f'{BASE_URL}{img_url}' 
                 
                 # Añadir la información de la hora e imagen al partido procesado
-                match['time'] = time_text
-                match['image'] = img_url if img_url else None
+                match.time = time_text
+                match.image = intern_text(img_url) if img_url else None
 
             # Buscar el href dentro de la clase 'game-info'
             game_info = row.find(class_='game-info')
             if game_info:
                 game_info_href = game_info.find('a', href=True)
                 if game_info_href:
-                    match['game_info_href'] = game_info_href['href']
-                    app.logger.info(f"Found game info href: {match['game_info_href']}")
+                    match.game_info_href = game_info_href['href']
+                    app.logger.info(f"Found game info href: {match.game_info_href}")
 
             # Añadir el partido a la lista de partidos si se procesó correctamente
             if match:
@@ -211,10 +2530,10 @@ def extract_matches(soup):
 
                     if matches:
                         # Actualizar los datos del partido con los goleadores
-                        matches[-1]['homeScorers'] = get_scorers_list(home_scorers_text)
-                        matches[-1]['awayScorers'] = get_scorers_list(away_scorers_text)
-                        app.logger.info(f"Updated home scorers: {matches[-1]['homeScorers']}")
-                        app.logger.info(f"Updated away scorers: {matches[-1]['awayScorers']}")
+                        matches[-1].home_scorers = tuple(get_scorers_list(home_scorers_text))
+                        matches[-1].away_scorers = tuple(get_scorers_list(away_scorers_text))
+                        app.logger.info(f"Updated home scorers: {matches[-1].home_scorers}")
+                        app.logger.info(f"Updated away scorers: {matches[-1].away_scorers}")
 
         except Exception as e:
             app.logger.error(f"Error processing row: {e}")
@@ -223,14 +2542,89 @@ def extract_matches(soup):
 
 
 
-def extract_table_positions(url):
-    """Extract the table of positions from a given league URL."""
+def extract_table_positions(url, details='full'):
+    """Extract the table of positions from a given league URL.
+
+    The bare table is cached; club details are attached afterwards from the club cache
+    according to details: 'none' skips them, 'cached' only uses clubs already cached and
+    'full' also downloads the missing ones concurrently.
+    """
+    positions = iter_table_positions(url, details)
+    return reuse_positions(url, details, list(positions)) if positions is not None else None
+
+
+assembled_positions = OrderedDict()
+assembled_positions_lock = threading.Lock()
+
+
+def reuse_positions(url, details, positions):
+    """The list returned last time for (url, details) if positions is equal to it, else positions.
+
+    Handing out the same list lets SerializedPayloads reuse its serialized and
+    compressed body while neither the table nor its clubs change.
+    """
+    key = (url, details)
+    with assembled_positions_lock:
+        previous = assembled_positions.get(key)
+        if previous == positions:
+            assembled_positions.move_to_end(key)
+            return previous
+        assembled_positions[key] = positions
+        assembled_positions.move_to_end(key)
+        while len(assembled_positions) > 64:
+            assembled_positions.popitem(last=False)
+    return positions
+
+
+def iter_table_positions(url, details='full'):
+    """Like extract_table_positions, but return a generator yielding each position when ready."""
+    table = page_cache.get_or_load('standings', url, lambda: scrape_table_positions(url))
+    if not table:
+        return None
+    return _iter_positions([replace(position) for position in table], details)
+
+
+def _iter_positions(positions, details):
+    if details == 'none':
+        yield from positions
+        return
+
+    names = [position.name for position in positions if position.name]
+    if details == 'cached':
+        clubs = iter((name, page_cache.peek('club', club_url(name))) for name in names)
+    elif all(page_cache.peek('club', club_url(name)) is not None for name in names):
+        # Todos en el cache (los vencidos se refrescan aparte): no hace falta el pool
+        clubs = iter((name, fetch_team_details(club_url(name))) for name in names)
+    else:
+        clubs = iter_concurrently(
+            lambda name: fetch_team_details(club_url(name)), names, CLUB_MAX_WORKERS, CLUB_DEADLINE
+        )
+
+    for position, team_details in iter_with_results(positions, lambda position: position.name, clubs):
+        if position.name:
+            position.team_details = team_details
+        yield position
+
+
+def club_url(name):
+    """URL of the promiedos page of a club."""
+    return f"{BASE_URL}club={name}"
+
+
+def scrape_table_positions(url):
+    """Download and parse the table of positions of a league URL."""
     html_content = fetch_html(url)
     if not html_content:
         app.logger.error(f"Failed to fetch content from {url}")
         return None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    return parse_memo.parse('standings', url, html_content, lambda html: parse_table_positions(html, url))
+
+
+@instrumented('extract_standings')
+def parse_table_positions(html_content, url):
+    """Parse the table of positions out of the HTML of a league page."""
+    soup = make_soup(html_content, 'standings')
     table = soup.find(class_='tablesorter1')
     if not table:
         app.logger.warning(f"No table found at {url}")
@@ -240,31 +2634,22 @@ def extract_table_positions(url):
     positions = []
     for row in rows:
         cols = row.find_all('td')
-        name_attr = row.get('name', None)
         if cols:
-            # Extract additional info from the row's "name" attribute
-
-
-            # Build the position dictionary
-            position = {
-                'team': safe_get_text(cols[0]),
-                'played': safe_get_text(cols[1]),
-                'won': safe_get_text(cols[2]),
-                'drawn': safe_get_text(cols[3]),
-                'lost': safe_get_text(cols[4]),
-                'gf': safe_get_text(cols[5]),
-                'ga': safe_get_text(cols[6]),
-                'gd': safe_get_text(cols[7]),
-                'points': safe_get_text(cols[8]),
-                'name': row.get('name', None)
-            }
-
-            if name_attr:
-                team_url = f"https://www.promiedos.com.ar/club={name_attr}"
-                team_details = fetch_team_details(team_url)
-                position['team_details'] = team_details
-
-
+            # Build the position row
+            position = StandingRow(
+                team=intern_text(safe_get_text(cols[0])),
+                played=safe_get_text(cols[1]),
+                won=safe_get_text(cols[2]),
+                drawn=safe_get_text(cols[3]),
+                lost=safe_get_text(cols[4]),
+                gf=safe_get_text(cols[5]),
+                ga=safe_get_text(cols[6]),
+                gd=safe_get_text(cols[7]),
+                points=safe_get_text(cols[8]),
+                name=intern_text(row.get('name', None))
+            )
+
+            # Los detalles del club se agregan en extract_table_positions
             positions.append(position)
             
 
@@ -273,131 +2658,747 @@ def extract_table_positions(url):
 @app.route('/results', methods=['GET'])
 @app.route('/results/<path:day>', methods=['GET'])
 def get_results(day=None):
+    """Matches of a results page.
+
+    ?fields= keeps only some keys of each match (id always stays). Fichas come in
+    id.additional_data unless ?expand=none, or ?fields= without ?expand=details: then
+    they are not fetched at all and id.match_id is left to ask for them.
+    """
+    try:
+        fields = requested_fields(request.args, RESULT_FIELDS, RESULT_LINK_FIELDS)
+        expand = requested_expand(request.args, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    projection = None if fields is None and expand else (fields, expand)
     url = f"{BASE_URL}{day}" if day else BASE_URL
-    html_content = fetch_html(url)
-    if not html_content:
+    stream_format = requested_stream_format()
+
+    # Primero el snapshot del sondeo de este worker, si no lo guardado por cualquier otro
+    snapshot = (results_poller.snapshot(url) or shared_cache.load('results', url, STORE_RESULTS_MAX_AGE)
+                or match_store.load_matches(url, STORE_RESULTS_MAX_AGE) or warm_start.results(url))
+    if snapshot:
+        matches, age = snapshot
+        if stream_format:
+            response = streamed_json_response(matches, stream_format, projection)
+        else:
+            response = cached_json_response(matches, CACHE_CONTROL['results'], projection)
+        response.headers['X-Snapshot-Age'] = f"{age:.1f}"
+        return response
+
+    if not expand:
+        # Sin fichas alcanza con las filas de la página, tal como quedaron memorizadas
+        matches = scrape_result_rows(url)
+        if matches is None:
+            return jsonify({"error": "No se pudo acceder a la página"}), 500
+        if not matches:
+            return jsonify({"error": "No se encontraron partidos en la página"}), 404
+        if stream_format:
+            return streamed_json_response(matches, stream_format, projection)
+        return cached_json_response(matches, CACHE_CONTROL['results'], projection)
+
+    if stream_format:
+        # Cada partido se manda apenas está su ficha, sin esperar a los demás
+        matches = iter_results(url)
+        if matches is None:
+            return jsonify({"error": "No se pudo acceder a la página"}), 500
+        first = next(matches, None)
+        if first is None:
+            return jsonify({"error": "No se encontraron partidos en la página"}), 404
+        return streamed_json_response(itertools.chain([first], matches), stream_format, projection)
+
+    # Las peticiones simultáneas de la misma página comparten una sola descarga y parseo
+    matches = inflight.do(('results', url), lambda: scrape_results_once(url))
+    if matches is None:
         return jsonify({"error": "No se pudo acceder a la página"}), 500
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    matches = extract_matches(soup)
-
     if matches:
-        return jsonify(matches)
+        return cached_json_response(matches, CACHE_CONTROL['results'], projection)
     else:
         return jsonify({"error": "No se encontraron partidos en la página"}), 404
 
+
+@app.route('/results/stream', methods=['GET'])
+def stream_results():
+    """Server-Sent Events: an initial snapshot of /results and then per-match deltas.
+
+    A WSGI worker can't hold idle connections open, so each one gets what the client is
+    missing (the snapshot, or the events after its Last-Event-ID) and a retry of
+    STREAM_RETRY seconds, after which EventSource reconnects with the id of the last
+    event it got, to whichever worker. asgi.py keeps the connections open instead.
+
+    Events come from the scrapes of /results: the poller's every POLL_LIVE_INTERVAL
+    with RESULTS_POLLER=1, otherwise only those of /results requests to any worker.
+    """
+    url = BASE_URL
+    follow_latest_results(url)
+    broker = result_events(url)
+    messages, _ = stream_messages(broker, broker.cursor_for(last_event_id(request.headers, request.args)))
+    return Response([b'retry: %d\n\n' % (STREAM_RETRY * 1000)] + messages, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def last_event_id(headers, args):
+    """Id of the last event a /results/stream client got, if it is resuming."""
+    return headers.get('last-event-id') or args.get('lastEventId')
+
+
+def follow_latest_results(url):
+    """Bring the events of url up to the results last published by any worker, scraping them if there are none."""
+    published = shared_cache.load('results', url)
+    if published:
+        match_tracker.follow(url, published[0])
+    elif result_events(url).version is None:
+        inflight.do(('results', url), lambda: scrape_results_once(url))
+
+
+def stream_messages(broker, cursor):
+    """SSE messages that bring a client at cursor up to date, and the cursor they leave it at.
+
+    Without a cursor, or when its events are no longer in the log, that is a snapshot.
+    """
+    events = broker.since(cursor) if cursor is not None else None
+    if events is None:
+        event_id, matches, cursor = broker.snapshot()
+        body = serialized_payloads.get(matches)['body'] if matches is not None else b'[]'
+        return [sse_message(event_id, 'snapshot', body)], cursor
+    messages = [sse_message(event_id, event['type'], dumps_json(event)) for _, event_id, event in events]
+    return messages, events[-1][0] if events else cursor
+
+
+def sse_message(event_id, event_type, body):
+    """One Server-Sent Events message carrying the JSON body (as dumps_json writes it)."""
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (event_id.encode(), event_type.encode(), bytes(body).rstrip(b'\n'))
+
+
+def scrape_results(url):
+    """Download a results page and extract its matches; None if it could not be fetched."""
+    rows = scrape_result_rows(url)
+    if rows is None:
+        return None
+    # La misma lista que se guarda y se publica, así se serializa una sola vez
+    matches = [replace(row) for row in rows]
+    for _ in _iter_results(url, matches):
+        pass
+    return matches
+
+
+def iter_results(url):
+    """Like scrape_results, but return a generator yielding each match as soon as its ficha is ready."""
+    rows = scrape_result_rows(url)
+    if rows is None:
+        return None
+    # Las filas memorizadas son compartidas: cada scrape completa sus propias copias
+    return _iter_results(url, [replace(row) for row in rows])
+
+
+def scrape_result_rows(url):
+    """Matches of a results page without their fichas, shared with other callers (do not modify them)."""
+    # La página de resultados es la que dice qué partidos están en juego: va primero
+    with upstream_priority('live'):
+        html_content = fetch_html(url)
+    if not html_content:
+        return None
+    return parse_memo.parse('results', url, html_content, parse_results_page)
+
+
+def parse_results_page(html_content):
+    """Extract the matches (without fichas) out of the HTML of a results page."""
+    return extract_match_rows(make_soup(html_content, 'results'))
+
+
+def _iter_results(url, matches):
+    yield from match_tracker.iter_details(url, matches)
+    if matches:
+        save_results(url, matches)
+
+
+def save_results(url, matches):
+    """Keep a fresh scrape of the results page url in the store and publish it to the other workers."""
+    match_store.save_matches(url, matches)
+    shared_cache.publish('results', url, matches)
+
+
+def scrape_results_once(url, max_age=STORE_RESULTS_MAX_AGE):
+    """scrape_results(url) holding the host-wide lock of the page.
+
+    If some worker published the page less than max_age seconds ago (maybe while this
+    one waited for the lock) its copy is returned instead, after passing it on to the
+    match tracker.
+    """
+    with shared_cache.lock('results', url):
+        published = shared_cache.load('results', url, max_age)
+        if published:
+            match_tracker.follow(url, published[0])
+            return published[0]
+        return scrape_results(url)
+
+
+def is_live_match(match):
+    """True if the match is being played (neither finished nor waiting to start)."""
+    state = match.game_state or ''
+    return state != 'Finalizado' and not state.startswith('Inicio:')
+
+
+class ResultsPoller:
+    """Background thread that keeps ready-made /results snapshots of the polled pages.
+
+    Every cycle it scrapes each page with scrape_results and stores the built matches.
+    It polls every live_interval seconds while some match is being played and every
+    idle_interval seconds otherwise. The thread is started lazily in each worker
+    process, on its first request.
+    """
+
+    def __init__(self, pages, live_interval=POLL_LIVE_INTERVAL, idle_interval=POLL_IDLE_INTERVAL,
+                 max_age=SNAPSHOT_MAX_AGE):
+        self.pages = pages
+        self.live_interval = live_interval
+        self.idle_interval = idle_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._counters = {'cycles': 0, 'errors': 0, 'served': 0}
+        self._live = False
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='results-poller', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self):
+        """Rebuild the snapshot of every page; True if some match is live."""
+        live = False
+        for page in self.pages:
+            url = f"{BASE_URL}{page}"
+            # Con varios workers sondeando, el que llega tarde toma la página del que ya la scrapeó
+            matches = inflight.do(('results', url), lambda: scrape_results_once(url, self.live_interval))
+            if matches:
+                with self._lock:
+                    self._snapshots[url] = (matches, time.time())
+                live = live or any(is_live_match(match) for match in matches)
+        with self._lock:
+            self._counters['cycles'] += 1
+            self._live = live
+        return live
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                live = self.poll_once()
+            except Exception as e:
+                app.logger.error(f"Error en el sondeo de resultados: {e}")
+                with self._lock:
+                    self._counters['errors'] += 1
+                live = False
+            self._stop.wait(self.live_interval if live else self.idle_interval)
+
+    def snapshot(self, url):
+        """Return (matches, age_in_seconds) for url, or None if there is no recent one."""
+        with self._lock:
+            entry = self._snapshots.get(url)
+            if entry is None:
+                return None
+            matches, built_at = entry
+            age = time.time() - built_at
+            if age > self.max_age:
+                return None
+            self._counters['served'] += 1
+        return matches, age
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['running'] = self._thread is not None and self._thread.is_alive()
+            stats['live'] = self._live
+            stats['snapshots'] = {url: round(time.time() - built_at, 1) for url, (_, built_at) in self._snapshots.items()}
+        return stats
+
+
+results_poller = ResultsPoller(POLL_PAGES)
+
+
+@app.before_request
+def start_results_poller():
+    if RESULTS_POLLER:
+        results_poller.ensure_started()
+
+
+class WarmStart:
+    """Pages saved by "flask warm-start", served by a process that just started while they are refreshed.
+
+    load() puts the standings, clubs and fichas in the page cache already expired, so
+    the first request for each one gets the saved copy at once and starts its refresh.
+    Results pages are handed out by results(), which refreshes the page in the
+    background and stops handing it out once that succeeds. A file older than max_age
+    is ignored; results pages and fichas of unfinished matches are only used while
+    they are younger than live_max_age.
+    """
+
+    def __init__(self, path=WARM_START_PATH, max_age=WARM_START_MAX_AGE, live_max_age=WARM_START_LIVE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.live_max_age = live_max_age
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._results = {}
+        self._refreshing = set()
+        self._counters = {'entries': 0, 'served': 0, 'refreshed': 0}
+
+    def load(self):
+        """Read the file, the first time it is called in this process."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+            saved_at = data['saved_at']
+            age = time.time() - saved_at
+            if age > self.max_age:
+                app.logger.warning(f"{self.path} es demasiado viejo, no se usa")
+                return
+            live = age <= self.live_max_age
+            entries = [('standings', BASE_URL + league, [StandingRow.from_json(row) for row in rows])
+                       for league, rows in data['standings'].items()]
+            entries += [('club', BASE_URL + name, Club.from_json(club)) for name, club in data['clubs'].items()]
+            fichas = [(match_id, FichaDetails.from_json(ficha)) for match_id, ficha in data['fichas'].items()]
+            entries += [('ficha', match_id, (ficha, 200)) for match_id, ficha in fichas
+                        if live or ficha.estado == 'Finalizado']
+            results = {BASE_URL + page: ([Match.from_json(match) for match in matches], saved_at)
+                       for page, matches in data['results'].items()} if live else {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            app.logger.warning(f"No se pudo leer {self.path}: {e}")
+            return
+
+        for kind, key, value in entries:
+            # Vencido desde ya: la primera petición recibe lo guardado y lo refresca
+            page_cache.store(kind, key, value, age=page_cache.ttl_for(kind, value) or 0)
+        with self._lock:
+            self._results.update(results)
+            self._counters['entries'] = len(entries) + len(results)
+
+    def results(self, url):
+        """(matches, age) saved for the results page url, refreshing it in the background; None if there are none."""
+        with self._lock:
+            entry = self._results.get(url)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.live_max_age:
+                # El refresco no llegó a tiempo: mejor scrapear que servir resultados viejos
+                del self._results[url]
+                return None
+            refresh = url not in self._refreshing
+            self._refreshing.add(url)
+            self._counters['served'] += 1
+        if refresh:
+            threading.Thread(target=self._refresh, args=(url,), daemon=True).start()
+        matches, saved_at = entry
+        return matches, max(time.time() - saved_at, 0)
+
+    def _refresh(self, url):
+        try:
+            matches = inflight.do(('results', url), lambda: scrape_results(url))
+        except Exception as e:
+            app.logger.error(f"Error refrescando {url}: {e}")
+            matches = None
+        with self._lock:
+            self._refreshing.discard(url)
+            if matches is not None:
+                self._results.pop(url, None)
+                self._counters['refreshed'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending_results'] = len(self._results)
+        stats['path'] = self.path
+        return stats
+
+
+warm_start = WarmStart()
+
+
+@app.before_request
+def load_warm_start():
+    warm_start.load()
+
+
+def save_warm_start(path, pages=POLL_PAGES, leagues=()):
+    """Scrape the results pages and the standings of leagues and save them, with their clubs and fichas, to path.
+
+    Returns how many entries of each kind were saved.
+    """
+    results = {}
+    for page in pages:
+        matches = scrape_results(f"{BASE_URL}{page}")
+        if matches:
+            results[page] = to_json(matches)
+    standings = {}
+    for league in leagues:
+        url = f"{BASE_URL}{league}"
+        if extract_table_positions(url, 'full'):
+            standings[league] = to_json(page_cache.peek('standings', url))
+    data = {
+        'saved_at': time.time(),
+        'results': results,
+        'standings': standings,
+        'clubs': {page_name(url): club.to_json() for url, club in page_cache.items('club') if club},
+        'fichas': {match_id: ficha.to_json() for match_id, (ficha, status) in page_cache.items('ficha')
+                   if status == 200 and ficha.error is None},
+    }
+    # Se escribe al lado y se renombra, así nadie lee un archivo a medio escribir
+    with open(f"{path}.tmp", 'wb') as f:
+        f.write(dumps_json(data))
+    os.replace(f"{path}.tmp", path)
+    return {kind: len(data[kind]) for kind in ('results', 'standings', 'clubs', 'fichas')}
+
+
+def backfill_results(days, end=None, force=False):
+    """Scrape the results pages of the last days days (before end) into the store.
+
+    Days whose page was already stored are skipped unless force is set. Returns
+    {date: matches saved}.
+    """
+    end = end or datetime.now(ARGENTINA_TZ).date()
+    saved = {}
+    for offset in range(days, 0, -1):
+        day = end - timedelta(days=offset)
+        url = f"{BASE_URL}{BACKFILL_DAY_PAGE.format(date=day)}"
+        if not force and match_store.has_page(url, day.isoformat()):
+            continue
+        with upstream_priority('backfill'):
+            html_content = fetch_html(url)
+            if not html_content:
+                app.logger.error(f"Failed to fetch content from {url}")
+                continue
+            matches = extract_matches(make_soup(html_content, 'results'))
+        if matches:
+            match_store.save_matches(url, matches, date=day.isoformat())
+        saved[day.isoformat()] = len(matches)
+    return saved
+
+
+@app.cli.command('backfill')
+@click.option('--days', default=30, show_default=True, help='Cantidad de días hacia atrás.')
+@click.option('--force', is_flag=True, help='Volver a bajar los días ya guardados.')
+def backfill_command(days, force):
+    """Guardar en la base los resultados de los días anteriores."""
+    for date, count in backfill_results(days, force=force).items():
+        click.echo(f"{date}: {count} partidos")
+
+
+@app.cli.command('warm-start')
+@click.option('--league', 'leagues', multiple=True, help='Tabla de posiciones a incluir, repetible.')
+@click.option('--output', default=WARM_START_PATH, show_default=True, help='Archivo a escribir.')
+def warm_start_command(leagues, output):
+    """Guardar resultados, tablas, clubes y fichas para el arranque en frío."""
+    for kind, count in save_warm_start(output, leagues=leagues).items():
+        click.echo(f"{kind}: {count}")
+
+
+def encode_history_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_history_cursor(cursor):
+    """The (date, page, position) key encoded in cursor; ValueError if it is not one."""
+    key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    if not (isinstance(key, list) and len(key) == 3 and isinstance(key[0], str) and isinstance(key[1], str)
+            and isinstance(key[2], int) and not isinstance(key[2], bool)):
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return key
+
+
+@app.route('/history/matches', methods=['GET'])
+def get_history_matches():
+    """Stored matches filtered by league, team, date range (from/to) and state, paginated.
+
+    The response is streamed: {"matches": [...], "next": <cursor or null>}.
+    """
+    args = request.args
+    state = args.get('state')
+    if state not in (None, 'finished', 'live', 'scheduled'):
+        return jsonify({"error": "El parámetro 'state' debe ser finished, live o scheduled"}), 400
+    try:
+        limit = min(int(args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError(f"limit inválido: {limit}")
+        after = decode_history_cursor(args['cursor']) if args.get('cursor') else None
+        for value in (args.get('from'), args.get('to')):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return jsonify({"error": "Parámetros inválidos"}), 400
+
+    rows = match_store.iter_matches(league=args.get('league'), team=args.get('team'), date_from=args.get('from'),
+                                    date_to=args.get('to'), state=state, after=after, limit=limit)
+
+    def generate():
+        # Las filas ya están guardadas como las escribe dumps_json: se envían sin decodificarlas
+        yield b'{"matches":['
+        count, last_key = 0, None
+        for key, data in rows:
+            yield (b',' if count else b'') + data.encode()
+            count, last_key = count + 1, key
+        next_cursor = encode_history_cursor(last_key) if last_key is not None and count == limit else None
+        yield b'],"next":' + dumps_json(next_cursor, newline=False) + b'}\n'
+
+    return Response(generate(), mimetype=app.config['JSONIFY_MIMETYPE'])
+
+
 @app.route('/standings/<league_name>', methods=['GET'])
 def get_standings(league_name):
+    """Table of positions of a league.
+
+    ?fields= keeps only some keys of each row (name always stays). Club details come
+    in team_details as ?details= says (none, cached or full); ?expand=details or
+    ?expand=none is the same as full or none, and ?fields= alone implies none.
+    """
+    try:
+        fields = requested_fields(request.args, STANDING_FIELDS, STANDING_LINK_FIELDS)
+        expand = requested_expand(request.args, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    details = request.args.get('details', 'full' if expand else 'none')
+    if details not in ('none', 'cached', 'full'):
+        return jsonify({"error": "El parámetro 'details' debe ser none, cached o full"}), 400
+    if fields is not None and details != 'none':
+        fields |= {'team_details'}
+    projection = None if fields is None else (fields, True)
+
     league_url = f"{BASE_URL}{league_name}"
-    positions = extract_table_positions(league_url)
+    stream_format = requested_stream_format()
+    if stream_format:
+        positions = iter_table_positions(league_url, details)
+        first = next(positions, None) if positions is not None else None
+        if first is None:
+            return jsonify({"error": "No se encontraron posiciones para la liga solicitada"}), 404
+        return streamed_json_response(itertools.chain([first], positions), stream_format, projection)
+
+    positions = extract_table_positions(league_url, details)
     if positions:
-        return jsonify(positions)
+        return cached_json_response(positions, CACHE_CONTROL['standings'], projection)
     else:
         return jsonify({"error": "No se encontraron posiciones para la liga solicitada"}), 404
 
 
+@instrumented('club')
 def fetch_team_details(url):
-    """Fetch additional details for a team from the given URL."""
-    html_content = fetch_html(url)
+    """Fetch additional details for a team from the given URL (cached)."""
+    return page_cache.get_or_load('club', url, lambda: scrape_team_details(url))
+
+
+def scrape_team_details(url):
+    """Download and parse the club page at the given URL."""
+    with upstream_priority('low'):
+        html_content = fetch_html(url)
     if not html_content:
         app.logger.error(f"Failed to fetch content from {url}")
         return None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    return parse_memo.parse('club', url, html_content, parse_team_details)
+
+
+@instrumented('extract_club')
+def parse_team_details(html_content):
+    """Parse the details of a team out of the HTML of its club page."""
+    soup = make_soup(html_content, 'club')
 
     # Extract specific team details based on the page structure
-    details = {
-    'nombre': safe_get_text(soup.find('strong')),  # Nombre del equipo
-    'nombreCompleto': safe_get_text(
+    details = Club(
+    nombre=safe_get_text(soup.find('strong')),  # Nombre del equipo
+    nombre_completo=safe_get_text(
         soup.find(text='Nombre completo:').parent.next_sibling
     ).strip() if soup.find(text='Nombre completo:') else "No encontrado",
-    'fundado': safe_get_text(
+    fundado=safe_get_text(
         soup.find(text='Fundación:').parent.next_sibling
     ).strip() if soup.find(text='Fundación:') else "No encontrado",
-    'apodo': safe_get_text(
+    apodo=safe_get_text(
         soup.find(text='Apodo:').parent.next_sibling
     ).strip() if soup.find(text='Apodo:') else "No encontrado",
-     'estadio': safe_get_text(soup.find(text='Estadio local:').find_next('br').next_sibling) if soup.find(text='Estadio local:') else None,
-    'imagen': soup.find('div', class_='clubder').find('img')['src'] if soup.find('div', class_='clubder') and soup.find('div', class_='clubder').find('img') else "No imagen encontrada"
-}
+     estadio=safe_get_text(soup.find(text='Estadio local:').find_next('br').next_sibling) if soup.find(text='Estadio local:') else None,
+    imagen=soup.find('div', class_='clubder').find('img')['src'] if soup.find('div', class_='clubder') and soup.find('div', class_='clubder').find('img') else "No imagen encontrada"
+)
     return details
 
 
+CLUB_ERROR = {"error": "Failed to fetch team details"}
+
+
 @app.route('/club=<name>', methods=['GET'])
 def get_club_details(name):
-    team_url = f"https://www.promiedos.com.ar/club={name}"
-    team_details = fetch_team_details(team_url)
+    team_details = fetch_team_details(club_url(name))
     if team_details:
-        return jsonify(team_details)
+        return cached_json_response(team_details, CACHE_CONTROL['club'])
     else:
-        return jsonify({"error": "Failed to fetch team details"}), 500
+        return jsonify(CLUB_ERROR), 500
 
 
 
 @app.route('/ficha=<match_id>', methods=['GET'])
 def get_ficha(match_id):
-    match_url = f"{BASE_URL}ficha={match_id}"
-    html_content = fetch_html(match_url)
-    if not html_content:
-        return jsonify({"error": "No se pudo acceder a la página del partido"}), 500
+    parsed_data, status = get_ficha_cached(match_id)
+    if status != 200 or parsed_data.error is not None:
+        return jsonify(parsed_data.to_json()), status
+    finished = parsed_data.estado == 'Finalizado'
+    return cached_json_response(parsed_data, CACHE_CONTROL['ficha_final' if finished else 'ficha'])
+
+
+def requested_batch_keys(field):
+    """Distinct keys posted to a batch endpoint, as a JSON list or as {field: [...]}; None if invalid."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get(field)
+    if not isinstance(data, list) or not all(isinstance(key, (str, int)) and not isinstance(key, bool)
+                                             for key in data):
+        return None
+    keys = list(dict.fromkeys(str(key).strip() for key in data))
+    return keys if keys and all(keys) and len(keys) <= BATCH_MAX_ITEMS else None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Imprimir el HTML para depurar
-    app.logger.debug(soup.prettify())
 
-    content = extract_usoficha_to_estadisticas(soup)
+def batch_response(fn, keys, max_workers, deadline, default):
+    """{key: fn(key)} of the keys fetched in parallel, or streamed as each one finishes."""
+    stream_format = requested_stream_format()
+    results = iter_concurrently(fn, keys, max_workers, deadline, default, ordered=not stream_format)
+    if stream_format:
+        return streamed_json_object(results, stream_format)
+    body = dumps_json({key: to_json(value) for key, value in results})
+    return app.response_class(body, mimetype=app.config['JSONIFY_MIMETYPE'])
 
-    if content:
-        parsed_data = parse_match_content(content, soup)
-        return jsonify(parsed_data)
-    else:
-        return jsonify({"error": "No se encontró el contenido entre 'usoficha' y 'ficha-estadisticas'"}), 404
 
-def extract_usoficha_to_estadisticas(soup):
-    """Extract content between 'usoficha' and 'ficha-estadisticas', if both are present."""
+@app.route('/fichas', methods=['POST'])
+def get_fichas():
+    """Fichas of several matches: {match_id: ficha or {"error": ...}}."""
+    match_ids = requested_batch_keys('ids')
+    if match_ids is None:
+        return jsonify({"error": f"Se espera una lista de entre 1 y {BATCH_MAX_ITEMS} ids en 'ids'"}), 400
+    return batch_response(fetch_match_details, match_ids, FICHA_MAX_WORKERS, FICHA_DEADLINE,
+                          FichaDetails(error="No se pudieron obtener detalles del partido"))
+
+
+@app.route('/clubs', methods=['POST'])
+def get_clubs():
+    """Details of several clubs: {name: club or {"error": ...}}."""
+    names = requested_batch_keys('names')
+    if names is None:
+        return jsonify({"error": f"Se espera una lista de entre 1 y {BATCH_MAX_ITEMS} nombres en 'names'"}), 400
+    return batch_response(lambda name: fetch_team_details(club_url(name)) or CLUB_ERROR, names,
+                          CLUB_MAX_WORKERS, CLUB_DEADLINE, CLUB_ERROR)
+
+
+ESTADO_PATTERN = re.compile(r"(Finalizado|Entretiempo|Inicio: .+|En juego|Suspendido)")
+
+# Encabezados de las secciones de incidencias dentro de la ficha
+FICHA_SECTIONS = {'GOLES': 'goles', 'AMARILLAS': 'amarillas', 'ROJAS': 'rojas', 'CAMBIOS': None}
+
+
+@instrumented('extract_ficha')
+def extract_ficha(soup):
+    """Extract the ficha data walking once from 'usoficha' up to 'ficha-estadisticas'.
+
+    Replaces the old text walk + parse_match_content (kept in benchmarks/bench_ficha.py to
+    compare against): the walk stops at 'ficha-estadisticas' and picks up the estado, the lines of the GOLES, AMARILLAS and
+    ROJAS sections and the 'cambios' blocks on the way (a 'cambios' block also closes
+    the current section). Returns None when either element is missing or there is no
+    text between them.
+    """
+    from bs4 import NavigableString, Tag
     try:
-        # Buscar el contenedor con id 'usoficha'
         usoficha_element = soup.find(attrs={'id': 'usoficha'})
-        
         if not usoficha_element:
             app.logger.warning("Elemento 'usoficha' no encontrado.")
             return None
-        
-        # Buscar el contenedor con id 'ficha-estadisticas'
-        estadisticas_element = soup.find(attrs={'id': 'ficha-estadisticas'})
-        
-        if not estadisticas_element:
+
+        estado = None
+        sections = {'goles': [], 'amarillas': [], 'rojas': []}
+        current_section = None
+        cambios = []
+        has_content = False
+        reached_estadisticas = False
+
+        for element in usoficha_element.next_elements:
+            if isinstance(element, Tag):
+                if element.get('id') == 'ficha-estadisticas':
+                    reached_estadisticas = True
+                    break
+                classes = element.get('class', ())
+                if 'cambios' in classes:
+                    cambios.append(None)
+                    current_section = None  # Los cambios cierran la sección de incidencias
+                elif 'incidencias2' in classes:
+                    # Cada bloque 'cambios' usa el primer 'incidencias2' que le sigue
+                    for i in range(len(cambios)):
+                        if cambios[i] is None:
+                            cambios[i] = element.get_text(separator="\n").strip()
+                continue
+
+            if type(element) is not NavigableString:
+                continue  # Comentarios, CDATA, etc.
+            text = element.strip()
+            if not text:
+                continue
+            has_content = True
+
+            if estado is None:
+                estado_match = ESTADO_PATTERN.search(text)
+                if estado_match:
+                    estado = estado_match.group(0)
+
+            if text.upper() in FICHA_SECTIONS:
+                current_section = FICHA_SECTIONS[text.upper()]
+            elif current_section:
+                sections[current_section].append(text)
+
+        if not reached_estadisticas:
             app.logger.warning("Elemento 'ficha-estadisticas' no encontrado.")
             return None
-
-        # Extraer todos los elementos entre 'usoficha' y 'ficha-estadisticas'
-        content_elements = usoficha_element.find_all_next(string=True)
-        
-        content = []
-        for element in content_elements:
-            # Detenerse cuando se llega a 'ficha-estadisticas'
-            if element == estadisticas_element:
-                break
-            if element.strip():  # Asegurarse de que no se agregue texto vacío
-                content.append(element.strip())
-        
-        if not content:
+        if not has_content:
             app.logger.warning("No se encontró contenido válido entre 'usoficha' y 'ficha-estadisticas'.")
             return None
 
-        return "\n".join(content)
-    
+        # Los cambios pueden estar fuera del bloque recorrido
+        if not cambios:
+            for cambio in soup.find_all(attrs={"class": "cambios"}, limit=2):
+                incidencias = cambio.find_next(attrs={"class": "incidencias2"})
+                cambios.append(incidencias.get_text(separator="\n").strip() if incidencias else None)
+
+        cambios = [cambio or "No hubo" for cambio in cambios[:2]]
+        cambios += ["No hubo"] * (2 - len(cambios))
+
+        return FichaDetails(
+            estado=estado or "En juego",
+            cambios_local=cambios[0],
+            cambios_visitante=cambios[1],
+            goles=tuple(sections['goles']),
+            amarillas=tuple(sections['amarillas']),
+            rojas=tuple(sections['rojas']),
+        )
+
     except Exception as e:
-        app.logger.error(f"Error extrayendo el contenido: {e}")
-        return None
+        app.logger.error(f"Error extrayendo la ficha: {e}")
+        return FichaDetails(error="Error al procesar el contenido")
 
 
 def parse_match_content(content, soup):
     try:
         # Estado y goles usando regex
-        estado_pattern = re.compile(r"(Finalizado|Entretiempo|Inicio: .+|En juego|Suspendido)")
-        estado_match = estado_pattern.search(content)
+        estado_match = ESTADO_PATTERN.search(content)
 
         # Cambios usando BeautifulSoup
         cambios_local = "No hubo"
@@ -471,7 +3472,7 @@ def fetch_and_scrape_links(base_url, links):
             continue
 
         # Process the content of each URL as needed
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
         # Extract specific data from each page if needed
         # For demonstration, just collecting the URL and a short excerpt of the content
         page_data = {
@@ -494,7 +3495,7 @@ def fetch_video_frame_url(base_url, links):
             app.logger.error(f"Failed to fetch content from {full_url}")
             continue
 
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
         iframe = soup.find('iframe', id='videoFrame')
 
         if iframe:
@@ -567,7 +3568,7 @@ def get_cards():
     if not html_content:
         return jsonify({"error": "No se pudo acceder a la página"}), 500
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content)
     card_data = extract_cards_from_containers(soup)
 
     if card_data:
@@ -583,7 +3584,7 @@ def get_card_containers():
     if not html_content:
         return jsonify({"error": "No se pudo acceder a la página"}), 500
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content)
     card_data = extract_cards_from_containers(soup)
 
     if card_data:
@@ -600,7 +3601,7 @@ def test():
     <div class="cambios">...</div>
     <div class="incidencias2">Cambio 1 Visitante<br>Cambio 2 Visitante</div>
     """
-    soup = BeautifulSoup(fake_html, 'html.parser')
+    soup = make_soup(fake_html)
     content = "Estado: Finalizado\nGOLES\nlocal: Gol A\nvisitante: Gol B\nAMARILLAS\nlocal: Amarilla A\nvisitante: Amarilla B\n"
     result = parse_match_content(content, soup)
     return jsonify(result)
@@ -650,6 +3651,103 @@ def get_cardss():
     return jsonify(channels)
 
 
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'upstream': upstream.stats(),
+        'upstream_limit': upstream_limiter.stats(),
+        'cache': page_cache.stats(),
+        'singleflight': inflight.stats(),
+        'poller': results_poller.stats(),
+        'matches': match_tracker.stats(),
+        'parsing': parse_memo.stats(),
+        'store': match_store.stats(),
+        'shared_cache': shared_cache.stats(),
+        'warm_start': warm_start.stats(),
+    })
+
+
+@app.before_request
+def start_request_timing():
+    request_timing.set(RequestTiming())
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the time and upstream requests of the request (until the first byte if streamed)."""
+    timing = request_timing.get()
+    if timing is None:
+        return response
+    server_timing = record_request(timing, request.endpoint or 'not_found', response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+
+def record_request(timing, endpoint, status):
+    """Record a finished request in the metrics; returns its Server-Timing value if enabled."""
+    elapsed = time.perf_counter() - timing.started
+    labels = (('endpoint', endpoint),)
+    metrics.observe('promiedos_request_seconds', labels, elapsed)
+    metrics.inc('promiedos_requests_total', labels + (('status', str(status)),))
+    metrics.observe('promiedos_upstream_calls_per_request', labels, timing.upstream_calls)
+    return timing.server_timing(elapsed) if SERVER_TIMING else None
+
+
+@app.after_request
+def compress_response(response):
+    """Compress the other responses (cached_json_response compresses its own) if the client accepts it.
+
+    Registered after record_request_metrics so it runs before it and the time counts.
+    """
+    if (response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    size = response.content_length or 0
+    if size < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings, size)
+    if encoding is None:
+        return response
+    response.set_data(compress_body(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics of this worker, plus the counters of /stats that fit as metrics."""
+    upstream_stats = upstream.stats()
+    cache_stats = page_cache.stats()
+    parse_stats = parse_memo.stats()
+    singleflight_stats = inflight.stats()
+    extra = [
+        ('promiedos_upstream_retries_total', 'counter', 'Upstream requests retried.',
+         {(): upstream_stats['retries']}),
+        ('promiedos_upstream_not_modified_total', 'counter', 'Upstream pages revalidated with a 304.',
+         {(): upstream_stats['not_modified']}),
+        ('promiedos_upstream_bytes_total', 'counter', 'Bytes downloaded from upstream.',
+         {(): upstream_stats['bytes']}),
+        ('promiedos_page_cache_entries', 'gauge', 'Entries in the page cache.', {(): cache_stats['entries']}),
+        ('promiedos_page_cache_bytes', 'gauge', 'Estimated size of the page cache.', {(): cache_stats['bytes']}),
+        ('promiedos_page_cache_evictions_total', 'counter', 'Entries evicted from the page cache.',
+         {(): cache_stats['evictions']}),
+        ('promiedos_parses_total', 'counter', 'Pages parsed, by route.',
+         {(('route', route),): count for route, count in parse_stats['parses'].items()}),
+        ('promiedos_parses_avoided_total', 'counter', 'Parses skipped because the page did not change.',
+         {(('route', route),): count for route, count in parse_stats['avoided'].items()}),
+        ('promiedos_parse_cpu_seconds_total', 'counter', 'CPU time spent parsing, by route.',
+         {(('route', route),): cpu for route, cpu in parse_stats['cpu_seconds'].items()}),
+        ('promiedos_singleflight_collapsed_total', 'counter', 'Calls that waited for an identical one in flight.',
+         {(('kind', kind),): count for kind, count in singleflight_stats['collapsed'].items()}),
+    ]
+    return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+
 ##if __name__ == '__main__':
     #app.run(host='0.0.0.0', port=5000)
 
@@ -0,0 +1,869 @@
+"""Async (ASGI) entry point: the same API served from an event loop.
+
+    uvicorn asgi:app
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 2
+
+/results, /results/<day>, /standings/<league_name>, /club=<name> and /ficha=<match_id>
+are served natively: pages are downloaded with httpx and parsed in a pool, so a
+single process keeps hundreds of scrapes in flight instead of one per thread. They
+share the caches, the store, the match tracker and the metrics of app.py, and answer
+the same JSON. /results/stream keeps its connections open, waiting on the loop for
+the events of the page. Every other route (and any method but GET) is passed on to
+the Flask app, run in a thread pool.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from email.utils import format_datetime
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+import httpx
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_date, parse_etags, quote_etag
+
+from app import app as flask_app
+from app import (BASE_URL, CACHE_CONTROL, CLUB_DEADLINE, CLUB_MAX_WORKERS, COMPRESS_MIN_SIZE, FICHA_DEADLINE,
+                 FICHA_MAX_WORKERS, RESULT_FIELDS, RESULT_LINK_FIELDS, RESULTS_POLLER, STANDING_FIELDS,
+                 STANDING_LINK_FIELDS, STORE_RESULTS_MAX_AGE, STREAM_HEARTBEAT, FichaDetails, RequestTiming,
+                 UpstreamClient, UpstreamShed, club_url, current_priority, dumps_json, ficha_result, is_live_match,
+                 last_event_id, match_store, match_tracker, negotiate_encoding, page_cache, parse_memo,
+                 parse_results_page, parse_ficha_page, parse_table_positions, parse_team_details, project,
+                 record_request, record_stage, request_timing, requested_expand, requested_fields, result_events,
+                 results_poller, reuse_positions, save_results, serialized_payloads, shared_cache, stream_messages,
+                 upstream_priority, warm_start)
+
+# Dónde corre el parseo: 'thread' (un pool de hilos de este proceso) o 'process' (procesos
+# aparte, en paralelo de verdad a costa de copiar los resultados)
+ASYNC_PARSE_POOL = os.environ.get('ASYNC_PARSE_POOL', 'thread')
+ASYNC_PARSE_WORKERS = int(os.environ.get('ASYNC_PARSE_WORKERS', os.cpu_count() or 2))
+# Conexiones abiertas a la vez hacia las páginas de origen
+ASYNC_UPSTREAM_CONNECTIONS = int(os.environ.get('ASYNC_UPSTREAM_CONNECTIONS', 100))
+# Hilos para las rutas que atiende la app Flask
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 32))
+
+
+class AsyncUpstreamClient(UpstreamClient):
+    """UpstreamClient on httpx.AsyncClient: same retries, backoff, validators and metrics."""
+
+    def __init__(self, max_connections=ASYNC_UPSTREAM_CONNECTIONS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, url, **kwargs):
+        """GET url through the shared client, retrying transient failures."""
+        client = self._get_client()
+        host = httpx.URL(url).netloc.decode()
+        timing = request_timing.get()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            if not await self._acquire(host):
+                raise UpstreamShed(f"Sin turno para pedir {url}")
+            self._count('requests')
+            if timing is not None:
+                timing.count_upstream()
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError) as e:
+                self._count('errors')
+                self._record(host, started, 'error')
+                if attempt == self.retries:
+                    raise
+                flask_app.logger.warning(f"Reintentando {url}: {e}")
+                continue
+            self._record(host, started, str(response.status_code))
+            self._count('bytes', len(response.content))
+            if response.status_code < 500 or attempt == self.retries:
+                return response
+            self._count('errors')
+            flask_app.logger.warning(f"Reintentando {url}: HTTP {response.status_code}")
+
+    async def _acquire(self, host):
+        """UpstreamLimiter.acquire, waiting for the token without blocking the loop."""
+        limiter = self.limiter
+        if not limiter.rate:
+            return True
+        priority = current_priority.get() or 'normal'
+        started, waited = time.monotonic(), 0.0
+        while True:
+            delay = limiter.take(host, priority)
+            if not delay:
+                limiter.granted(priority, waited)
+                return True
+            if waited + delay > limiter.priorities[priority][1]:
+                limiter.shed(host, priority)
+                return False
+            await asyncio.sleep(delay)
+            waited = time.monotonic() - started
+
+    async def get_text(self, url):
+        """Body of url as text, revalidating the copy seen before (see UpstreamClient.get_text)."""
+        known, headers = self._conditional_headers(url)
+        response = await self.get(url, headers=headers)
+        if response.status_code == 304 and known:
+            self._count('not_modified')
+            return known[2]
+        response.raise_for_status()
+
+        text = response.text
+        self._remember_validators(url, response.headers, text)
+        return text
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent calls with the same key share one execution."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        # Si nadie más esperaba, el error igual queda leído
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+upstream = AsyncUpstreamClient()
+inflight = AsyncSingleFlight()
+parse_threads = ThreadPoolExecutor(max_workers=ASYNC_PARSE_WORKERS, thread_name_prefix='parse')
+parse_processes = None
+wsgi_threads = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='wsgi')
+# Tareas que siguen corriendo sin que nadie las espere (refrescos, fichas fuera de plazo)
+background_tasks = set()
+
+
+def spawn(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def instrumented(stage):
+    """Like app.instrumented, for coroutine functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record_stage(stage, time.perf_counter() - started, failed)
+        return wrapper
+    return decorator
+
+
+def run_in_process(parser, html_content):
+    return parse_processes.submit(parser, html_content).result()
+
+
+async def parse(route, url, html_content, parser):
+    """parse_memo.parse in the parse pool, so the event loop never runs BeautifulSoup."""
+    if parse_processes is not None:
+        parser = functools.partial(run_in_process, parser)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_threads, contextvars.copy_context().run,
+                                      parse_memo.parse, route, url, html_content, parser)
+
+
+@instrumented('fetch')
+async def fetch_html(url):
+    """Fetch HTML content from the given URL; concurrent calls for the same URL share one download."""
+    return await inflight.do(('html', url), lambda: _fetch_html(url))
+
+
+async def _fetch_html(url):
+    try:
+        return await upstream.get_text(url)
+    except UpstreamShed as e:
+        flask_app.logger.warning(str(e))
+        return None
+    except httpx.HTTPError as e:
+        flask_app.logger.error(f"Request error: {e}")
+        return None
+
+
+async def cached(kind, key, loader, refresh=False):
+    """page_cache.get_or_load (or reload with refresh) for an async loader."""
+    if not refresh:
+        value, state = page_cache.lookup(kind, key)
+        if state == 'refresh':
+            spawn(_refresh(kind, key, loader))
+        if state != 'miss':
+            return value
+    return await inflight.do((kind, key), lambda: _load(kind, key, loader, use_store=not refresh))
+
+
+async def _load(kind, key, loader, use_store=True):
+    # Como PageCache._load: con el lock del host, para que un solo worker vaya a la página de origen
+    lock = await asyncio.to_thread(shared_cache.acquire, kind, key)
+    try:
+        value = await asyncio.to_thread(page_cache.from_host, kind, key) if use_store else None
+        if value is None:
+            value = await loader()
+            await asyncio.to_thread(page_cache.remember, kind, key, value)
+        return value
+    finally:
+        shared_cache.release(lock)
+
+
+async def _refresh(kind, key, loader):
+    try:
+        await inflight.do((kind, key), lambda: _load(kind, key, loader))
+    except Exception as e:
+        page_cache.refresh_done(kind, key, e)
+    else:
+        page_cache.refresh_done(kind, key)
+
+
+async def load_ficha(match_id):
+    """Download and parse a ficha; returns (data, status_code) as served by /ficha."""
+    match_url = f"{BASE_URL}ficha={match_id}"
+    html_content = await fetch_html(match_url)
+    if not html_content:
+        return FichaDetails(error="No se pudo acceder a la página del partido"), 500
+    return ficha_result(await parse('ficha', match_url, html_content, parse_ficha_page))
+
+
+async def get_ficha_cached(match_id, refresh=False):
+    return await cached('ficha', match_id, lambda: load_ficha(match_id), refresh)
+
+
+@instrumented('ficha')
+async def fetch_match_details(match_id, refresh=False):
+    """Fetch match details from the ficha endpoint."""
+    try:
+        match_data, status = await get_ficha_cached(match_id, refresh)
+        if status == 200:
+            return match_data
+        return FichaDetails(error="No se pudieron obtener detalles del partido")
+    except Exception as e:
+        flask_app.logger.error(f"Error fetching match details: {e}")
+        return FichaDetails(error="Error al acceder al endpoint de ficha")
+
+
+async def iter_concurrently(fn, keys, max_workers, deadline, default=None):
+    """Async app.iter_concurrently: yield (key, result) in key order as each one is ready.
+
+    Calls still running when the deadline passes are left to finish in the background
+    (their result still reaches the caches) and map to default.
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def bounded(key):
+        async with semaphore:
+            return await fn(key)
+
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    tasks = {key: spawn(bounded(key)) for key in dict.fromkeys(keys)}
+    for key, task in tasks.items():
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), max(end - loop.time(), 0))
+        except Exception:
+            flask_app.logger.warning(f"{getattr(fn, '__name__', fn)}({key}) sin respuesta a tiempo")
+            result = default
+        yield key, result
+
+
+async def iter_with_results(items, key_of, results):
+    """Async app.iter_with_results."""
+    found = {}
+    for item in items:
+        key = key_of(item)
+        if key is not None and key not in found:
+            async for done_key, result in results:
+                found[done_key] = result
+                if done_key == key:
+                    break
+        yield item, found.get(key)
+
+
+async def iter_results(url):
+    """Async app.iter_results: None if the page could not be fetched, else an async generator."""
+    rows = await scrape_result_rows(url)
+    if rows is None:
+        return None
+    return _iter_results(url, [replace(row) for row in rows])
+
+
+async def scrape_result_rows(url):
+    """Async app.scrape_result_rows."""
+    with upstream_priority('live'):
+        html_content = await fetch_html(url)
+    if not html_content:
+        return None
+    return await parse('results', url, html_content, parse_results_page)
+
+
+async def _iter_results(url, matches):
+    changed, refresh, previous = match_tracker.reuse_known(url, matches)
+    live = {match.match_id for match in changed if is_live_match(match)}
+
+    async def fetch_ficha(match_id):
+        with upstream_priority('live' if match_id in live else 'normal'):
+            return await fetch_match_details(match_id, match_id in refresh)
+
+    details = iter_concurrently(
+        fetch_ficha,
+        [match.match_id for match in changed], FICHA_MAX_WORKERS, FICHA_DEADLINE,
+        default=FichaDetails(error="No se pudieron obtener detalles del partido"),
+    )
+    changed_ids = {id(match) for match in changed}
+    fetched = iter_with_results(changed, lambda match: match.match_id, details)
+    for match in matches:
+        if id(match) in changed_ids:
+            _, match.additional_data = await anext(fetched)
+        yield match
+    match_tracker.remember(url, matches, changed, previous)
+    if matches:
+        await asyncio.to_thread(save_results, url, matches)
+
+
+async def scrape_results(url):
+    """Async app.scrape_results."""
+    rows = await scrape_result_rows(url)
+    if rows is None:
+        return None
+    matches = [replace(row) for row in rows]
+    async for _ in _iter_results(url, matches):
+        pass
+    return matches
+
+
+async def scrape_results_once(url, max_age=STORE_RESULTS_MAX_AGE):
+    """Async app.scrape_results_once."""
+    lock = await asyncio.to_thread(shared_cache.acquire, 'results', url)
+    try:
+        published = await asyncio.to_thread(shared_cache.load, 'results', url, max_age)
+        if published:
+            match_tracker.follow(url, published[0])
+            return published[0]
+        return await scrape_results(url)
+    finally:
+        shared_cache.release(lock)
+
+
+async def scrape_table_positions(url):
+    html_content = await fetch_html(url)
+    if not html_content:
+        flask_app.logger.error(f"Failed to fetch content from {url}")
+        return None
+    return await parse('standings', url, html_content, functools.partial(parse_table_positions, url=url))
+
+
+async def iter_table_positions(url, details='full'):
+    """Async app.iter_table_positions."""
+    table = await cached('standings', url, lambda: scrape_table_positions(url))
+    if not table:
+        return None
+    return _iter_positions([replace(position) for position in table], details)
+
+
+async def _iter_positions(positions, details):
+    if details == 'none':
+        for position in positions:
+            yield position
+        return
+
+    names = [position.name for position in positions if position.name]
+    if details == 'cached':
+        async def peek_clubs():
+            for name in names:
+                yield name, page_cache.peek('club', club_url(name))
+        clubs = peek_clubs()
+    else:
+        clubs = iter_concurrently(lambda name: fetch_team_details(club_url(name)), names, CLUB_MAX_WORKERS,
+                                  CLUB_DEADLINE)
+
+    async for position, team_details in iter_with_results(positions, lambda position: position.name, clubs):
+        if position.name:
+            position.team_details = team_details
+        yield position
+
+
+@instrumented('club')
+async def fetch_team_details(url):
+    """Fetch additional details for a team from the given URL (cached)."""
+    return await cached('club', url, lambda: scrape_team_details(url))
+
+
+async def scrape_team_details(url):
+    with upstream_priority('low'):
+        html_content = await fetch_html(url)
+    if not html_content:
+        flask_app.logger.error(f"Failed to fetch content from {url}")
+        return None
+    return await parse('club', url, html_content, parse_team_details)
+
+
+class Request:
+    """What the handlers need from an ASGI http scope."""
+
+    def __init__(self, scope, receive=None):
+        self.scope = scope
+        self.receive = receive
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = {}
+        for name, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(name, value)
+
+    def stream_format(self):
+        """Same as app.requested_stream_format."""
+        accept = parse_accept_header(self.headers.get('accept'), MIMEAccept)
+        if accept.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+            return 'ndjson'
+        if self.args.get('stream') in ('1', 'true'):
+            return 'array'
+        return None
+
+    async def disconnected(self):
+        """Return once the client has closed the connection."""
+        while (await self.receive())['type'] != 'http.disconnect':
+            pass
+
+
+class Response:
+    def __init__(self, status, body=b'', headers=(), content_type='application/json', stream=None):
+        self.status = status
+        self.body = body
+        self.headers = list(headers)
+        self.stream = stream
+        if content_type and status != 304:
+            self.headers.append(('Content-Type', content_type))
+
+    async def send(self, send):
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in self.headers]
+        if self.stream is None:
+            headers.append((b'content-length', str(len(self.body)).encode()))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        if self.stream is None:
+            await send({'type': 'http.response.body', 'body': self.body})
+            return
+        async for chunk in self.stream:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def error_response(message, status):
+    """The same body jsonify({"error": message}) gives."""
+    body = json.dumps({'error': message}, sort_keys=True, separators=(',', ':')) + '\n'
+    return Response(status, body.encode())
+
+
+def cached_json_response(request, payload, cache_control, projection=None):
+    """Same as app.cached_json_response."""
+    entry = serialized_payloads.get(payload, projection)
+    encoding = negotiate_encoding(parse_accept_header(request.headers.get('accept-encoding')), len(entry['body']))
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        not_modified = parse_etags(if_none_match).contains_weak(entry['etag'])
+    else:
+        since = parse_date(request.headers.get('if-modified-since'))
+        not_modified = bool(since) and entry['last_modified'] <= since
+
+    headers = [('ETag', quote_etag(entry['etag'], weak=encoding is not None)),
+               ('Last-Modified', format_datetime(entry['last_modified'], usegmt=True)),
+               ('Cache-Control', cache_control)]
+    if len(entry['body']) >= COMPRESS_MIN_SIZE:
+        headers.append(('Vary', 'Accept-Encoding'))
+    if not_modified:
+        return Response(304, headers=headers)
+    if encoding is None:
+        return Response(200, bytes(entry['body']), headers)
+    return Response(200, serialized_payloads.encoded(entry, encoding), headers + [('Content-Encoding', encoding)])
+
+
+def streamed_json_response(items, stream_format, projection=None):
+    """Same as app.streamed_json_response, for an async iterable."""
+    async def generate():
+        first = True
+        async for item in items:
+            body = dumps_json(item if projection is None else project(item, projection), newline=False)
+            if stream_format == 'ndjson':
+                yield body + b'\n'
+            else:
+                yield (b'[' if first else b',') + body
+            first = False
+        if stream_format == 'array':
+            yield b'[]\n' if first else b']\n'
+
+    content_type = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+    return Response(200, content_type=content_type, stream=generate())
+
+
+async def chain(first, rest):
+    yield first
+    async for item in rest:
+        yield item
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
+async def get_results(request, day=None):
+    try:
+        fields = requested_fields(request.args, RESULT_FIELDS, RESULT_LINK_FIELDS)
+        expand = requested_expand(request.args, fields)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    projection = None if fields is None and expand else (fields, expand)
+    url = f"{BASE_URL}{day}" if day else BASE_URL
+    stream_format = request.stream_format()
+
+    snapshot = (results_poller.snapshot(url)
+                or await asyncio.to_thread(shared_cache.load, 'results', url, STORE_RESULTS_MAX_AGE)
+                or await asyncio.to_thread(match_store.load_matches, url, STORE_RESULTS_MAX_AGE) or warm_start.results(url))
+    if snapshot:
+        matches, age = snapshot
+        if stream_format:
+            response = streamed_json_response(aiter_list(matches), stream_format, projection)
+        else:
+            response = cached_json_response(request, matches, CACHE_CONTROL['results'], projection)
+        response.headers.append(('X-Snapshot-Age', f"{age:.1f}"))
+        return response
+
+    if not expand:
+        matches = await scrape_result_rows(url)
+        if matches is None:
+            return error_response("No se pudo acceder a la página", 500)
+        if not matches:
+            return error_response("No se encontraron partidos en la página", 404)
+        if stream_format:
+            return streamed_json_response(aiter_list(matches), stream_format, projection)
+        return cached_json_response(request, matches, CACHE_CONTROL['results'], projection)
+
+    if stream_format:
+        matches = await iter_results(url)
+        if matches is None:
+            return error_response("No se pudo acceder a la página", 500)
+        first = await anext(matches, None)
+        if first is None:
+            return error_response("No se encontraron partidos en la página", 404)
+        return streamed_json_response(chain(first, matches), stream_format, projection)
+
+    matches = await inflight.do(('results', url), lambda: scrape_results_once(url))
+    if matches is None:
+        return error_response("No se pudo acceder a la página", 500)
+    if matches:
+        return cached_json_response(request, matches, CACHE_CONTROL['results'], projection)
+    return error_response("No se encontraron partidos en la página", 404)
+
+
+async def get_standings(request, league_name):
+    try:
+        fields = requested_fields(request.args, STANDING_FIELDS, STANDING_LINK_FIELDS)
+        expand = requested_expand(request.args, fields)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    details = request.args.get('details', 'full' if expand else 'none')
+    if details not in ('none', 'cached', 'full'):
+        return error_response("El parámetro 'details' debe ser none, cached o full", 400)
+    if fields is not None and details != 'none':
+        fields |= {'team_details'}
+    projection = None if fields is None else (fields, True)
+
+    league_url = f"{BASE_URL}{league_name}"
+    positions = await iter_table_positions(league_url, details)
+    stream_format = request.stream_format()
+    if stream_format:
+        first = await anext(positions, None) if positions is not None else None
+        if first is None:
+            return error_response("No se encontraron posiciones para la liga solicitada", 404)
+        return streamed_json_response(chain(first, positions), stream_format, projection)
+
+    positions = [position async for position in positions] if positions is not None else None
+    if positions:
+        positions = reuse_positions(league_url, details, positions)
+        return cached_json_response(request, positions, CACHE_CONTROL['standings'], projection)
+    return error_response("No se encontraron posiciones para la liga solicitada", 404)
+
+
+async def get_club_details(request, name):
+    team_details = await fetch_team_details(club_url(name))
+    if team_details:
+        return cached_json_response(request, team_details, CACHE_CONTROL['club'])
+    return error_response("Failed to fetch team details", 500)
+
+
+async def get_ficha(request, match_id):
+    parsed_data, status = await get_ficha_cached(match_id)
+    if status != 200 or parsed_data.error is not None:
+        return error_response(parsed_data.error, status)
+    finished = parsed_data.estado == 'Finalizado'
+    return cached_json_response(request, parsed_data, CACHE_CONTROL['ficha_final' if finished else 'ficha'])
+
+
+class StreamWaiters:
+    """/results/stream subscribers waiting on the event loop for the events of an EventBroker.
+
+    They hold no thread: all of them wait on one future, resolved and replaced every
+    time the broker publishes events, from whatever thread does it.
+    """
+
+    def __init__(self, broker, loop):
+        self.broker = broker
+        self.loop = loop
+        self._future = loop.create_future()
+        broker.add_listener(self.wake)
+
+    def wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass  # El loop ya se cerró
+
+    def _wake(self):
+        self._future.set_result(None)
+        self._future = self.loop.create_future()
+
+    async def wait(self, cursor, timeout, disconnected):
+        """Wait for events after cursor, up to timeout seconds; False if the client went away first."""
+        if self.broker.last <= cursor:
+            await asyncio.wait((self._future, disconnected), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        return not disconnected.done()
+
+
+stream_waiters = {}
+
+
+def waiters_for(url):
+    loop = asyncio.get_running_loop()
+    waiters = stream_waiters.get(url)
+    if waiters is None or waiters.loop is not loop:
+        if waiters is not None:
+            waiters.broker.remove_listener(waiters.wake)
+        waiters = stream_waiters[url] = StreamWaiters(result_events(url), loop)
+    return waiters
+
+
+async def follow_latest_results(url):
+    """Async app.follow_latest_results."""
+    published = await asyncio.to_thread(shared_cache.load, 'results', url)
+    if published:
+        match_tracker.follow(url, published[0])
+    elif result_events(url).version is None:
+        await inflight.do(('results', url), lambda: scrape_results_once(url))
+
+
+async def stream_results(request):
+    """app.stream_results keeping the connection open: events are sent as they are published."""
+    url = BASE_URL
+    await follow_latest_results(url)
+    broker = result_events(url)
+    cursor = broker.cursor_for(last_event_id(request.headers, request.args))
+    waiters = waiters_for(url)
+    disconnected = spawn(request.disconnected())
+
+    async def generate():
+        messages, position = stream_messages(broker, cursor)
+        try:
+            while True:
+                for message in messages:
+                    yield message
+                if not await waiters.wait(position, STREAM_HEARTBEAT, disconnected):
+                    return
+                messages, position = stream_messages(broker, position)
+                if not messages:
+                    messages = [b': keep-alive\n\n']
+        finally:
+            disconnected.cancel()
+
+    return Response(200, headers=[('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')],
+                    content_type='text/event-stream', stream=generate())
+
+
+ROUTES = [
+    (re.compile(r'/results/stream'), stream_results),
+    (re.compile(r'/results(?:/(?P<day>(?!stream$).+))?'), get_results),
+    (re.compile(r'/standings/(?P<league_name>[^/]+)'), get_standings),
+    (re.compile(r'/club=(?P<name>[^/]+)'), get_club_details),
+    (re.compile(r'/ficha=(?P<match_id>[^/]+)'), get_ficha),
+]
+
+
+def cors_headers(request):
+    """What flask-cors adds to every response."""
+    origin = request.headers.get('origin')
+    return [('Access-Control-Allow-Origin', origin), ('Vary', 'Origin')] if origin else \
+        [('Access-Control-Allow-Origin', '*')]
+
+
+async def serve(handler, request, params, send):
+    if RESULTS_POLLER:
+        results_poller.ensure_started()
+    timing = RequestTiming()
+    token = request_timing.set(timing)
+    try:
+        try:
+            response = await handler(request, **params)
+        except Exception:
+            flask_app.logger.exception(f"Error en {request.scope['path']}")
+            response = Response(500, b'Internal Server Error', content_type='text/plain; charset=utf-8')
+        server_timing = record_request(timing, handler.__name__, response.status)
+        if server_timing:
+            response.headers.append(('Server-Timing', server_timing))
+        response.headers += cors_headers(request)
+        await response.send(send)
+    finally:
+        request_timing.reset(token)
+
+
+async def serve_wsgi(scope, receive, send):
+    """Run the request through the Flask app in wsgi_threads, streaming its body chunk by chunk."""
+    body = BytesIO()
+    while True:
+        message = await receive()
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = int(status.split(' ', 1)[0]), headers
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(wsgi_threads, flask_app, environ, start_response)
+    chunks = iter(result)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = spawn(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': started['status'],
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in started['headers']]})
+        while not disconnected.is_set():
+            chunk = await loop.run_in_executor(wsgi_threads, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        if hasattr(result, 'close'):
+            await loop.run_in_executor(wsgi_threads, result.close)
+
+
+async def lifespan(receive, send):
+    global parse_processes
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if ASYNC_PARSE_POOL == 'process':
+                parse_processes = ProcessPoolExecutor(ASYNC_PARSE_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            if RESULTS_POLLER:
+                results_poller.ensure_started()
+            await asyncio.to_thread(warm_start.load)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await upstream.aclose()
+            if parse_processes is not None:
+                parse_processes.shutdown(cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    if scope['method'] == 'GET':
+        for pattern, handler in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match:
+                params = {name: value for name, value in match.groupdict().items() if value is not None}
+                await serve(handler, Request(scope, receive), params, send)
+                return
+    await serve_wsgi(scope, receive, send)
@@ -0,0 +1,90 @@
+"""Micro-benchmark of the ficha extraction on the recorded pages in fixtures/.
+
+Compares the old path (extract_usoficha_to_estadisticas, kept here, + parse_match_content)
+with the single-pass extract_ficha, parsing each page once and timing only the extraction.
+
+    python benchmarks/bench_ficha.py [--repeat 200]
+"""
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def extract_usoficha_to_estadisticas(soup):
+    """Extract content between 'usoficha' and 'ficha-estadisticas', if both are present.
+
+    The text walk that extract_ficha replaced, as it was in app.py.
+    """
+    try:
+        # Buscar el contenedor con id 'usoficha'
+        usoficha_element = soup.find(attrs={'id': 'usoficha'})
+
+        if not usoficha_element:
+            app.app.logger.warning("Elemento 'usoficha' no encontrado.")
+            return None
+
+        # Buscar el contenedor con id 'ficha-estadisticas'
+        estadisticas_element = soup.find(attrs={'id': 'ficha-estadisticas'})
+
+        if not estadisticas_element:
+            app.app.logger.warning("Elemento 'ficha-estadisticas' no encontrado.")
+            return None
+
+        # Extraer todos los elementos entre 'usoficha' y 'ficha-estadisticas'
+        content_elements = usoficha_element.find_all_next(string=True)
+
+        content = []
+        for element in content_elements:
+            # Detenerse cuando se llega a 'ficha-estadisticas'
+            if element == estadisticas_element:
+                break
+            if element.strip():  # Asegurarse de que no se agregue texto vacío
+                content.append(element.strip())
+
+        if not content:
+            app.app.logger.warning("No se encontró contenido válido entre 'usoficha' y 'ficha-estadisticas'.")
+            return None
+
+        return "\n".join(content)
+
+    except Exception as e:
+        app.app.logger.error(f"Error extrayendo el contenido: {e}")
+        return None
+
+
+def legacy_extract(soup):
+    content = extract_usoficha_to_estadisticas(soup)
+    return app.parse_match_content(content, soup) if content else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<24}{'legacy (ms)':>14}{'single pass (ms)':>18}{'speedup':>10}")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'ficha_*.html'))):
+        with open(path, encoding='utf-8') as f:
+            soup = app.make_soup(f.read(), 'ficha')
+
+        legacy = legacy_extract(soup)
+        single = app.extract_ficha(soup)
+        for key in ('estado', 'cambios_local', 'cambios_visitante'):
+            assert legacy[key] == getattr(single, key), f"{path}: '{key}' difiere"
+
+        legacy_ms = min(timeit.repeat(lambda: legacy_extract(soup), number=args.repeat, repeat=3)) / args.repeat * 1000
+        single_ms = min(timeit.repeat(lambda: app.extract_ficha(soup), number=args.repeat, repeat=3)) / args.repeat * 1000
+        name = os.path.splitext(os.path.basename(path))[0]
+        print(f"{name:<24}{legacy_ms:>14.3f}{single_ms:>18.3f}{legacy_ms / single_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Cold start of the API: import time and first responses, with and without a warm-start file.
+
+    python benchmarks/cold_start.py [--runs 5] [--latency 0.3] [--import-budget 400]
+
+Every run is a fresh interpreter with an empty store and shared cache, pointed at
+the stand-in (upstream.py), that imports app and answers one request to each of the
+routes. The warm-start file is written first with the same code as "flask
+warm-start". The report gives the median import time and time to each first
+response; --import-budget exits with 1 when importing app takes longer than that
+many milliseconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PATHS = ['/results', '/standings/liga', '/club=river', '/results?fields=homeTeam,awayTeam,homeScore,awayScore']
+
+
+def child(paths):
+    """Run inside the fresh interpreter: import app, hit paths and print the timings as JSON."""
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import app
+
+    timings = {'import_ms': (time.perf_counter() - started) * 1000}
+    client = app.app.test_client()
+    for path in paths:
+        started = time.perf_counter()
+        status = client.get(path).status_code
+        timings[path] = ((time.perf_counter() - started) * 1000, status)
+    print(json.dumps(timings))
+
+
+def save_warm_start(env, path):
+    code = (f"import sys; sys.path.insert(0, {ROOT!r}); import app; "
+            f"print(app.save_warm_start({path!r}, leagues=['liga']))")
+    subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True)
+
+
+def run(env, paths, runs, workdir):
+    """Median import time and time of each first response over runs fresh interpreters."""
+    samples = []
+    for n in range(runs):
+        run_dir = os.path.join(workdir, f'run-{time.monotonic_ns()}-{n}')
+        env = dict(env, STORE_PATH=f'{run_dir}.sqlite3', SHARED_CACHE_DIR=run_dir)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', *paths], env=env,
+                                check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    report = {'import_ms': round(statistics.median(sample['import_ms'] for sample in samples), 1)}
+    for path in paths:
+        report[path] = {
+            'ms': round(statistics.median(sample[path][0] for sample in samples), 1),
+            'status': samples[-1][path][1],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.3, help='stand-in latency')
+    parser.add_argument('--import-budget', type=float, help='maximum median import time of app (ms)')
+    parser.add_argument('--json', help='save the report to this file')
+    parser.add_argument('--child', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args.child)
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import upstream
+
+    server, upstream_url, _ = upstream.start(latency=args.latency)
+    # Cada proceso termina con refrescos aún en curso: las conexiones cortadas no son errores
+    server.handle_error = lambda request, client_address: None
+    workdir = tempfile.mkdtemp(prefix='promiedos-cold-')
+    warm_path = os.path.join(workdir, 'warm_start.json')
+    env = dict(os.environ, BASE_URL=upstream_url, UPSTREAM_RATE='0', WARM_START_PATH='')
+    save_warm_start(dict(env, STORE_PATH=os.path.join(workdir, 'save.sqlite3'),
+                         SHARED_CACHE_DIR=os.path.join(workdir, 'save')), warm_path)
+
+    report = {
+        'cold': run(env, PATHS, args.runs, workdir),
+        'warm': run(dict(env, WARM_START_PATH=warm_path), PATHS, args.runs, workdir),
+    }
+    print(f"{'':<56}{'cold (ms)':>12}{'warm (ms)':>12}")
+    print(f"{'import app':<56}{report['cold']['import_ms']:>12.1f}{report['warm']['import_ms']:>12.1f}")
+    for path in PATHS:
+        print(f"{'first ' + path:<56}{report['cold'][path]['ms']:>12.1f}{report['warm'][path]['ms']:>12.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    import_ms = statistics.median([report['cold']['import_ms'], report['warm']['import_ms']])
+    if args.import_budget and import_ms > args.import_budget:
+        print(f"Importar app tarda {import_ms:.0f} ms, más que el presupuesto de {args.import_budget:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Bytes on the wire and CPU per request of the JSON routes, uncompressed and with each encoding.
+
+    python benchmarks/compression.py [--requests 200] [--json compression.json]
+
+The app is imported here, pointed at the stand-in (upstream.py) without latency, and
+every route is requested once to fill the caches. Then each route is requested
+--requests times with every Accept-Encoding: "identity" is how responses went before
+compression, the others how they go now, with the compressed body of a cached payload
+reused between requests. "compress each time" is the CPU that compressing that body
+on every request would add, for comparison. /stats is not cached, so it is compressed
+on every request.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import upstream  # noqa: E402
+
+ROUTES = ['/results', '/results?fields=homeTeam,awayTeam,homeScore,awayScore', '/standings/liga',
+          '/ficha={id}', '/club=river', '/stats']
+
+
+def cpu_per_request(client, path, accept_encoding, requests):
+    """(body bytes, CPU seconds per request) of requests GETs of path."""
+    headers = {'Accept-Encoding': accept_encoding}
+    started = time.process_time()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+    return len(response.get_data()), (time.process_time() - started) / requests, response.headers.get('Content-Encoding')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='requests per route and encoding')
+    parser.add_argument('--json', help='save the report to this file')
+    args = parser.parse_args()
+
+    _, upstream_url, _ = upstream.start()
+    workdir = tempfile.mkdtemp(prefix='promiedos-compress-')
+    os.environ.update(BASE_URL=upstream_url, UPSTREAM_RATE='0', WARM_START_PATH='',
+                      STORE_PATH=os.path.join(workdir, 'store.sqlite3'),
+                      SHARED_CACHE_DIR=os.path.join(workdir, 'shared'))
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import logging
+    import app
+
+    app.app.logger.setLevel(logging.ERROR)
+    client = app.app.test_client()
+    ficha_id = json.loads(client.get('/results').get_data())[0]['id']['match_id']
+    routes = [route.format(id=ficha_id) for route in ROUTES]
+    for path in routes:
+        client.get(path)
+
+    report = {'encodings': app.CONTENT_ENCODINGS, 'levels': app.COMPRESS_LEVELS, 'routes': {}}
+    print(f"{'route':<58}{'encoding':>10}{'bytes':>9}{'ratio':>8}{'CPU/req (us)':>14}{'compress each time (us)':>25}")
+    for path in routes:
+        rows = report['routes'][path] = {}
+        identity = client.get(path, headers={'Accept-Encoding': 'identity'}).get_data()
+        for encoding in ['identity'] + app.CONTENT_ENCODINGS:
+            size, cpu, sent = cpu_per_request(client, path, encoding, args.requests)
+            compress = None
+            if sent:
+                started = time.process_time()
+                for _ in range(args.requests):
+                    app.compress_body(identity, encoding)
+                compress = (time.process_time() - started) / args.requests
+            rows[encoding] = {
+                'bytes': size,
+                'ratio': round(len(identity) / size, 2),
+                'cpu_us': round(cpu * 1e6, 1),
+                'compress_us': round(compress * 1e6, 1) if compress is not None else None,
+                'sent': sent or 'identity',
+            }
+            label = encoding if sent or encoding == 'identity' else f'{encoding}*'
+            print(f"{path:<58}{label:>10}{size:>9}{rows[encoding]['ratio']:>8.1f}{cpu * 1e6:>14.1f}"
+                  f"{compress * 1e6 if compress is not None else 0:>25.1f}")
+    print('* sin comprimir: el cuerpo tiene menos de COMPRESS_MIN_SIZE bytes')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Load test of the API against the fixtures served by the local stand-in (upstream.py).
+
+By default both the stand-in and the API are started inside this process, with
+BASE_URL pointing at the stand-in and a fresh SQLite store and shared cache. --mode
+picks how the API is served: sync (the Flask app on a threaded werkzeug server, one
+thread per request up to --server-threads) or async (asgi.py on uvicorn). The
+upstream rate limit is off unless --upstream-rate is given:
+
+    python benchmarks/load.py [--mode async] [--concurrency 16] [--duration 20] [--latency 0.05]
+
+To measure a server started on its own (gunicorn, several workers...), pass its URL
+and the stand-in it uses:
+
+    python benchmarks/upstream.py --port 8765 &
+    BASE_URL=http://127.0.0.1:8765/ gunicorn -w 1 --threads 16 app:app &
+    python benchmarks/load.py --target http://127.0.0.1:8000 --upstream http://127.0.0.1:8765/
+
+The report gives p50/p95/p99 latency per route, throughput, upstream requests per
+client request and parse CPU time (from /stats, so with several workers it only
+covers the one that answered). --json saves the report and --compare checks it against
+a saved one, exiting with 1 when p95 or throughput got worse by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import upstream  # noqa: E402
+
+# Peso de cada ruta en la mezcla de peticiones
+ROUTES = {
+    '/results': 4,
+    '/results/ayer': 1,
+    '/results/manana': 1,
+    '/standings/liga': 2,
+    '/ficha={id}': 3,
+    '/club={name}': 2,
+}
+
+
+def fixture_ids():
+    """Ficha ids of the results fixtures and club names of the standings fixture."""
+    pages = upstream.load_fixtures()
+    ficha_ids = sorted({match_id.decode() for name, body in pages.items() if name.startswith('results_')
+                        for match_id in re.findall(rb'ficha=([0-9a-f]+)', body)})
+    clubs = [name.decode() for name in re.findall(rb'<tr name="(\w+)"', pages['standings_liga'])]
+    return ficha_ids, clubs
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def start_local_api(upstream_url, mode='sync', server_threads=16, upstream_rate=0):
+    """Import the app pointed at upstream_url and serve it on a free port; returns its URL."""
+    os.environ['BASE_URL'] = upstream_url
+    os.environ['UPSTREAM_RATE'] = str(upstream_rate)
+    workdir = tempfile.mkdtemp(prefix='promiedos-bench-')
+    os.environ.setdefault('STORE_PATH', os.path.join(workdir, 'store.sqlite3'))
+    os.environ.setdefault('SHARED_CACHE_DIR', os.path.join(workdir, 'shared'))
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import logging
+    import app
+
+    app.app.logger.setLevel(logging.WARNING)
+    if mode == 'async':
+        import uvicorn
+
+        server = uvicorn.Server(uvicorn.Config('asgi:app', host='127.0.0.1', port=0, log_level='warning'))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        return f'http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}'
+
+    from socketserver import ThreadingMixIn
+    from werkzeug.serving import BaseWSGIServer
+
+    class BoundedThreadedServer(ThreadingMixIn, BaseWSGIServer):
+        """Like gunicorn --threads: at most server_threads requests are handled at a time."""
+        daemon_threads = True
+        slots = threading.BoundedSemaphore(server_threads)
+
+        def process_request(self, request, client_address):
+            self.slots.acquire()
+            super().process_request(request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                super().process_request_thread(request, client_address)
+            finally:
+                self.slots.release()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = BoundedThreadedServer('127.0.0.1', 0, app.app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def run_load(target, routes, concurrency, duration, seed=0):
+    """Hit target from concurrency threads for duration seconds; returns {route: [(seconds, status)]}."""
+    ficha_ids, clubs = fixture_ids()
+    names, weights = list(routes), list(routes.values())
+    results = {name: [] for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        session = requests.Session()
+        samples = []
+        while time.monotonic() < deadline:
+            route = rng.choices(names, weights)[0]
+            path = route.format(id=rng.choice(ficha_ids), name=rng.choice(clubs))
+            started = time.perf_counter()
+            try:
+                status = session.get(target + path, timeout=60).status_code
+            except requests.RequestException:
+                status = 0
+            samples.append((route, time.perf_counter() - started, status))
+        with lock:
+            for route, seconds, status in samples:
+                results[route].append((seconds, status))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results, duration, upstream_delta, parse_delta):
+    report = {'routes': {}}
+    everything = []
+    for route, samples in results.items():
+        latencies = sorted(seconds for seconds, _ in samples)
+        everything += latencies
+        report['routes'][route] = {
+            'requests': len(samples),
+            'errors': sum(1 for _, status in samples if status == 0 or status >= 500),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
+    everything.sort()
+    total = len(everything)
+    report['total'] = {
+        'requests': total,
+        'errors': sum(route['errors'] for route in report['routes'].values()),
+        'p50_ms': round(percentile(everything, 50) * 1000, 2),
+        'p95_ms': round(percentile(everything, 95) * 1000, 2),
+        'p99_ms': round(percentile(everything, 99) * 1000, 2),
+        'throughput_rps': round(total / duration, 1),
+        'upstream_requests': upstream_delta,
+        'upstream_per_request': round(upstream_delta / total, 3) if total else 0.0,
+        'parse_cpu_seconds': round(sum(parse_delta.values()), 3),
+        'parse_cpu_by_route': {route: round(cpu, 3) for route, cpu in parse_delta.items()},
+    }
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{'route':<18}{'requests':>10}{'errors':>8}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}")
+    for route, row in list(report['routes'].items()) + [('total', report['total'])]:
+        print(f"{route:<18}{row['requests']:>10}{row['errors']:>8}{row['p50_ms']:>11.1f}{row['p95_ms']:>11.1f}"
+              f"{row['p99_ms']:>11.1f}")
+    total = report['total']
+    print(f"throughput: {total['throughput_rps']} req/s")
+    print(f"upstream: {total['upstream_requests']} requests, {total['upstream_per_request']} per client request")
+    print(f"parse CPU: {total['parse_cpu_seconds']} s {total['parse_cpu_by_route']}")
+    if baseline:
+        base = baseline['total']
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'upstream_per_request', 'parse_cpu_seconds'):
+            change = (total[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            print(f"  {key:<22}{base[key]:>10} -> {total[key]:<10} ({change:+.1f}%)")
+
+
+def regressed(report, baseline, tolerance):
+    """True if p95 latency rose or throughput fell by more than tolerance against baseline."""
+    total, base = report['total'], baseline['total']
+    return (total['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+            or total['throughput_rps'] < base['throughput_rps'] * (1 - tolerance))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', help='URL of an API already running (default: start one here)')
+    parser.add_argument('--upstream', help='URL of the stand-in it uses (default: start one here)')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync', help='how to serve the API started here')
+    parser.add_argument('--server-threads', type=int, default=16, help='request threads of the sync mode')
+    parser.add_argument('--upstream-rate', type=float, default=0,
+                        help='UPSTREAM_RATE of the API started here (default: no limit)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=0, help='seconds of load before measuring')
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in latency (only if started here)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='stand-in jitter (only if started here)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='stand-in 503 rate (only if started here)')
+    parser.add_argument('--route', action='append', help='only hit these routes (as in ROUTES), repeatable')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='save the report to this file')
+    parser.add_argument('--compare', help='report saved with --json to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    upstream_url = args.upstream
+    if not upstream_url:
+        _, upstream_url, _ = upstream.start(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                            seed=args.seed)
+    target = (args.target or start_local_api(upstream_url, args.mode, args.server_threads, args.upstream_rate)).rstrip('/')
+    routes = {route: ROUTES[route] for route in args.route} if args.route else ROUTES
+
+    if args.warmup:
+        run_load(target, routes, args.concurrency, args.warmup, args.seed)
+
+    upstream_before = requests.get(upstream_url.rstrip('/') + '/__stats').json()['requests']
+    parse_before = requests.get(target + '/stats').json()['parsing'].get('cpu_seconds', {})
+    started = time.monotonic()
+    results = run_load(target, routes, args.concurrency, args.duration, args.seed)
+    elapsed = time.monotonic() - started
+    upstream_after = requests.get(upstream_url.rstrip('/') + '/__stats').json()['requests']
+    parse_after = requests.get(target + '/stats').json()['parsing'].get('cpu_seconds', {})
+
+    parse_delta = {route: cpu - parse_before.get(route, 0.0) for route, cpu in parse_after.items()}
+    report = summarize(results, elapsed, upstream_after - upstream_before, parse_delta)
+    report['settings'] = {key: value for key, value in vars(args).items() if key not in ('json', 'compare')}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline and regressed(report, baseline, args.tolerance):
+        print(f"Regresión: p95 o throughput empeoraron más de {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Local stand-in for promiedos.com.ar that replays the pages in fixtures/.
+
+    python benchmarks/upstream.py [--port 8765] [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+
+Run the API against it with BASE_URL=http://127.0.0.1:8765/. Pages are picked by path:
+
+    /                      results_home.html
+    /ayer, /manana         results_ayer.html, results_manana.html
+    /fecha=<dd-mm-yyyy>    results_ayer.html
+    /ficha=<id>            one of the ficha_*.html, always the same for the same id
+    /club=<name>           club_<name>.html, or one of the club_*.html
+    anything else          standings_liga.html
+
+Every page is delayed latency plus up to jitter seconds, and error_rate of the requests
+get a 503. Responses carry an ETag and honour If-None-Match. GET /__stats returns the
+counters as JSON and GET /__reset clears them.
+"""
+import argparse
+import glob
+import hashlib
+import http.server
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures(path=FIXTURES):
+    """{name: bytes} of the HTML fixtures in path."""
+    pages = {}
+    for file_path in glob.glob(os.path.join(path, '*.html')):
+        with open(file_path, 'rb') as f:
+            pages[os.path.splitext(os.path.basename(file_path))[0]] = f.read()
+    return pages
+
+
+class StandIn:
+    """Maps request paths to fixtures and keeps the counters of what was served."""
+
+    def __init__(self, pages, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fichas = sorted(name for name in pages if name.startswith('ficha_'))
+        self.clubs = sorted(name for name in pages if name.startswith('club_'))
+        self.etags = {name: '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest() for name, body in pages.items()}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {'requests': 0, 'errors': 0, 'not_modified': 0, 'bytes': 0, 'by_kind': {}}
+
+    def page_for(self, path):
+        """(kind, fixture name) served for path."""
+        path = path.lstrip('/').split('?')[0]
+        if path in ('', 'index.php'):
+            return 'results', 'results_home'
+        if path in ('ayer', 'manana'):
+            return 'results', f'results_{path}'
+        if path.startswith('fecha='):
+            return 'results', 'results_ayer'
+        if path.startswith('ficha='):
+            return 'ficha', self.fichas[zlib.crc32(path.encode()) % len(self.fichas)]
+        if path.startswith('club='):
+            name = f'club_{path[5:]}'
+            return 'club', name if name in self.pages else self.clubs[zlib.crc32(path.encode()) % len(self.clubs)]
+        return 'standings', 'standings_liga'
+
+    def serve(self, path, if_none_match=None):
+        """(status, headers, body) for a GET of path."""
+        kind, name = self.page_for(path)
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['by_kind'][kind] = self.counters['by_kind'].get(kind, 0) + 1
+            failed = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if failed:
+            with self._lock:
+                self.counters['errors'] += 1
+            return 503, {'Content-Type': 'text/plain'}, b'Service Unavailable'
+        etag = self.etags[name]
+        if if_none_match and etag in if_none_match:
+            with self._lock:
+                self.counters['not_modified'] += 1
+            return 304, {'ETag': etag}, b''
+        body = self.pages[name]
+        with self._lock:
+            self.counters['bytes'] += len(body)
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}, body
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self.counters))
+
+
+def make_handler(stand_in):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == '/__stats':
+                status, headers, body = 200, {'Content-Type': 'application/json'}, json.dumps(stand_in.stats()).encode()
+            elif self.path == '/__reset':
+                stand_in.reset()
+                status, headers, body = 204, {}, b''
+            else:
+                status, headers, body = stand_in.serve(self.path, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def start(port=0, host='127.0.0.1', **options):
+    """Serve the fixtures in a background thread; returns (server, base_url, stand_in)."""
+    stand_in = StandIn(load_fixtures(), **options)
+    server = http.server.ThreadingHTTPServer((host, port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/', stand_in
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.02, help='up to this many extra seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url, _ = start(args.port, args.host, latency=args.latency, jitter=args.jitter,
+                                error_rate=args.error_rate, seed=args.seed)
+    print(f"Sirviendo {FIXTURES} en {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
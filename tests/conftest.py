@@ -0,0 +1,22 @@
+"""The tests import app pointed at the stand-in (benchmarks/upstream.py), with a store, shared cache and
+limiter of their own, and no warm start."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import upstream  # noqa: E402
+
+_, UPSTREAM_URL, STAND_IN = upstream.start()
+WORKDIR = tempfile.mkdtemp(prefix='promiedos-tests-')
+os.environ.update(
+    BASE_URL=UPSTREAM_URL,
+    STORE_PATH=os.path.join(WORKDIR, 'store.sqlite3'),
+    SHARED_CACHE_DIR=os.path.join(WORKDIR, 'shared'),
+    UPSTREAM_LIMIT_PATH=os.path.join(WORKDIR, 'upstream.json'),
+    WARM_START_PATH='',
+    RESULTS_POLLER='0',
+)
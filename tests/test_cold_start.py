@@ -0,0 +1,53 @@
+"""Cold starts: what importing app pulls in, and what a warm start file may still serve."""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import pytest
+
+import app
+from conftest import ROOT
+
+# Mediana de `import app` en IMPORT_RUNS intérpretes nuevos (ver benchmarks/cold_start.py)
+IMPORT_BUDGET_MS = 600
+IMPORT_RUNS = 3
+IMPORT_APP = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+print(json.dumps({'ms': (time.perf_counter() - started) * 1000,
+                  'parsers': [name for name in ('bs4', 'lxml', 'httpx') if name in sys.modules]}))
+'''
+
+
+def test_import_app_leaves_the_parsers_and_httpx_for_later():
+    samples = [json.loads(subprocess.run([sys.executable, '-c', IMPORT_APP], cwd=ROOT, env=os.environ,
+                                         capture_output=True, check=True, text=True).stdout.splitlines()[-1])
+               for _ in range(IMPORT_RUNS)]
+    assert [sample['parsers'] for sample in samples] == [[]] * IMPORT_RUNS
+    assert statistics.median(sample['ms'] for sample in samples) < IMPORT_BUDGET_MS
+
+
+@pytest.mark.parametrize('age, live', [(60, True), (3600, False)])
+def test_old_warm_start_files_only_serve_slow_changing_pages(tmp_path, age, live):
+    path = tmp_path / 'warm_start.json'
+    path.write_bytes(app.dumps_json({
+        'saved_at': time.time() - age,
+        'results': {'': []},
+        'standings': {},
+        'clubs': {},
+        'fichas': {f'finished-{age}': {'estado': 'Finalizado'}, f'live-{age}': {'estado': "45'"}},
+    }))
+    warm_start = app.WarmStart(str(path), max_age=7 * 24 * 3600, live_max_age=300)
+    warm_start.load()
+
+    assert warm_start.stats()['pending_results'] == (1 if live else 0)
+    assert app.page_cache.peek('ficha', f'finished-{age}') is not None
+    assert (app.page_cache.peek('ficha', f'live-{age}') is not None) == live
+    if live:
+        # Si el refresco no llegó antes de live_max_age, los resultados guardados ya no se sirven
+        warm_start.live_max_age = 30
+        assert warm_start.results(app.BASE_URL) is None
@@ -0,0 +1,29 @@
+"""/results, /standings, /club and /ficha serve the JSON the code served before the dataclass models.
+
+The files in golden/ were captured from that code (the parent of the change to
+Match, FichaDetails, StandingRow and Club) against the stand-in, with its URL
+written as {BASE_URL}. The stand-in picks the fixture of a ficha by its id: the
+fichas below cover every ficha fixture.
+"""
+import json
+import os
+
+import pytest
+
+import app
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+ROUTES = ['/results', '/results/ayer', '/standings/liga', '/club=river', '/club=boca', '/ficha=2625c39b',
+          '/ficha=6a90169c', '/ficha=849e77b0', '/ficha=cf4666ae', '/ficha=fd42cf14']
+
+
+def golden(route):
+    with open(os.path.join(GOLDEN, route.strip('/').replace('/', '_') + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_json_is_the_golden(route):
+    response = app.app.test_client().get(route)
+    assert response.status_code == 200
+    assert json.loads(response.get_data(as_text=True).replace(app.BASE_URL, '{BASE_URL}')) == golden(route)
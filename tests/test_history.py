@@ -0,0 +1,15 @@
+"""/history/matches rejects bad pages and cursors before it starts streaming."""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-1', 'limit=x', 'cursor=MQ', 'cursor=WzFd', 'cursor=%%%',
+                                   'state=ended', 'from=2024-13-01'])
+def test_bad_parameters_are_a_400(query):
+    assert app.app.test_client().get(f'/history/matches?{query}').status_code == 400
+
+
+def test_cursors_round_trip():
+    key = ['2024-05-01', 'fecha=01-05-2024', 3]
+    assert app.decode_history_cursor(app.encode_history_cursor(key)) == key
@@ -0,0 +1,37 @@
+"""The parser backends and the restricted parsing of PAGE_STRAINERS extract the same from every fixture."""
+import importlib.util
+
+import pytest
+
+import app
+import upstream
+
+PAGES = upstream.load_fixtures()
+BACKENDS = ['html.parser'] + (['lxml'] if importlib.util.find_spec('lxml') else [])
+
+
+def parse(name, html_content):
+    """What the route of the fixture name extracts from it."""
+    kind = name.split('_')[0]
+    if kind == 'results':
+        return app.parse_results_page(html_content)
+    if kind == 'standings':
+        return app.parse_table_positions(html_content, app.BASE_URL + name)
+    if kind == 'club':
+        return app.parse_team_details(html_content)
+    return app.parse_ficha_page(html_content)
+
+
+@pytest.mark.parametrize('name', sorted(PAGES))
+def test_backends_give_the_same_json(name, monkeypatch):
+    html_content = PAGES[name].decode('utf-8')
+    # Referencia: la página completa con el parser de la librería estándar
+    monkeypatch.setattr(app, 'HTML_PARSER', 'html.parser')
+    with monkeypatch.context() as m:
+        m.setattr(app, 'page_strainer', lambda page: None)
+        expected = app.dumps_json(parse(name, html_content))
+    assert expected not in (b'null\n', b'[]\n')
+
+    for backend in BACKENDS:
+        monkeypatch.setattr(app, 'HTML_PARSER', backend)
+        assert app.dumps_json(parse(name, html_content)) == expected, backend
@@ -0,0 +1,30 @@
+"""SharedCache.sweep removes from disk the keys nobody publishes any more."""
+import os
+import time
+
+import app
+import upstream
+
+CLUB = app.parse_team_details(upstream.load_fixtures()['club_river'].decode('utf-8'))
+
+
+def backdate(cache, kind, key, seconds):
+    current = os.path.join(cache._dir(kind, key), 'current')
+    when = time.time() - seconds
+    os.utime(current, (when, when), follow_symlinks=False)
+
+
+def test_sweep_removes_keys_older_than_max_age(tmp_path):
+    cache = app.SharedCache(str(tmp_path), max_age=3600, sweep_interval=3600)
+    for key in ('old', 'recent', 'loading'):
+        cache.publish('club', key, CLUB)
+    backdate(cache, 'club', 'old', 7200)
+    backdate(cache, 'club', 'loading', 7200)
+
+    with cache.lock('club', 'loading'):
+        assert cache.sweep() == 1
+    assert not os.path.exists(cache._dir('club', 'old'))
+    assert cache.load('club', 'recent') is not None
+    assert cache.load('club', 'loading') is not None
+    assert cache.sweep() == 1
+    assert cache.stats()['evicted'] == 2
@@ -0,0 +1,46 @@
+"""How /results/stream clients resume from their Last-Event-ID (see EventBroker)."""
+import threading
+
+import app
+
+
+def score(n):
+    return {'type': 'score', 'match_id': f'0x{n}', 'homeScore': '1', 'awayScore': '0'}
+
+
+def test_resume_from_a_version_or_an_event_of_this_process():
+    broker = app.EventBroker()
+    broker.publish([], 'v1', [])
+    broker.publish([score(1), score(2)], 'v2', [])
+
+    first, last = broker.since(broker.cursor_for('v1'))
+    assert first[1] == f'{broker.token}.{first[0]}' and last[1] == 'v2'
+    assert [event for _, _, event in broker.since(broker.cursor_for(first[1]))] == [score(2)]
+    assert broker.since(broker.cursor_for('v2')) == []
+
+
+def test_other_workers_only_resume_from_versions_they_reached():
+    worker, other = app.EventBroker(), app.EventBroker()
+    for broker in (worker, other):
+        broker.publish([], 'v1', [])
+    worker.publish([score(1), score(2)], 'v2', [])
+    other.publish([score(1), score(2)], 'v2', [])
+
+    event_id = worker.since(worker.cursor_for('v1'))[0][1]
+    assert other.cursor_for(event_id) is None
+    assert other.since(other.cursor_for('v2')) == []
+    assert other.cursor_for('v3') is None
+
+
+def test_clients_left_behind_need_a_snapshot():
+    broker = app.EventBroker(maxlen=2)
+    broker.publish([], 'v1', [])
+    broker.publish([score(1), score(2), score(3)], 'v2', [])
+    assert broker.cursor_for('v1') is None
+    assert broker.cursor_for('v2') == broker.last
+
+
+def test_the_stream_leaves_the_poller_off_unless_enabled():
+    response = app.app.test_client().get('/results/stream')
+    assert response.status_code == 200 and b'event: snapshot' in response.get_data()
+    assert 'results-poller' not in [thread.name for thread in threading.enumerate()]
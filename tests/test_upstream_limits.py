@@ -0,0 +1,35 @@
+"""With the default upstream limits, a cold /results and /standings come with every ficha and club."""
+import json
+import os
+import subprocess
+import sys
+
+import upstream
+from conftest import ROOT
+
+# /results y /standings a la vez, como los primeros clientes de un worker recién arrancado
+COLD_START = '''
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+with ThreadPoolExecutor(2) as pool:
+    pages = pool.map(lambda path: json.loads(app.app.test_client().get(path).get_data()), ['/results', '/standings/liga'])
+print(json.dumps(list(pages)))
+'''
+
+
+def test_cold_results_and_standings_are_complete(tmp_path):
+    _, upstream_url, _ = upstream.start(latency=0.05, jitter=0.02)
+    env = {name: value for name, value in os.environ.items() if not name.startswith('UPSTREAM_')}
+    env.update(BASE_URL=upstream_url, STORE_PATH='', SHARED_CACHE_DIR=str(tmp_path / 'shared'),
+               UPSTREAM_LIMIT_PATH=str(tmp_path / 'upstream.json'))
+    output = subprocess.run([sys.executable, '-c', COLD_START], env=env, cwd=ROOT, capture_output=True,
+                            check=True).stdout
+    results, standings = json.loads(output)
+
+    assert results and standings
+    assert [match['id']['match_id'] for match in results
+            if 'error' in (match['id'].get('additional_data') or {})] == []
+    assert [row['name'] for row in standings if not row['team_details'] or 'error' in row['team_details']] == []